@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type
+
+from benchmarks.workloads import WORKLOADS, Workload
+from intcode_computer import Profile, Program, ProgramSource, Step, collapse_stacks
+from intcode_loader import load_program
+from intcode_jit import JitProgram
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUTS = os.path.join(BENCHMARK_DIR, "inputs")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+
+class CountingProgram(Program):
+    # Counts retired instructions, so a fused pair counts as both of its parts. A summarized loop
+    # still only counts its first instruction however many iterations it skips, which is why
+    # regressions are judged on wall time
+    instructions = 0
+
+    def __init__(self, program: ProgramSource, input_data: Optional[List[int]] = None) -> None:
+        super().__init__(program, input_data)
+        self.add_hook(self.counted_step)
+
+    def fork(self) -> "CountingProgram":
+        clone = super().fork()
+        clone.add_hook(clone.counted_step)
+        return clone
+
+    def counted_step(self, step: Step) -> Tuple[bool, Optional[int]]:
+        instruction = self.decode_cache.get(self.pointer)
+        if instruction is None:
+            instruction = self.decode(self.pointer)
+        result = step()
+        CountingProgram.instructions += len(instruction.parts or (instruction,))
+        return result
+
+
+class StackProfilingProgram(Program):
+    profiles: List[Profile] = []
+
+    def __init__(self, program: ProgramSource, input_data: Optional[List[int]] = None) -> None:
+        super().__init__(program, input_data)
+        StackProfilingProgram.profiles.append(self.enable_profiling(call_stacks=True))
+
+
+class Result(NamedTuple):
+    wall_time: float
+    instructions: int
+
+    def instructions_per_second(self) -> float:
+        return self.instructions / self.wall_time if self.wall_time else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"wall_time": self.wall_time, "instructions": self.instructions, "instructions_per_second": self.instructions_per_second()}
+
+
+def load_input(inputs_dir: str, day: int) -> Optional[List[int]]:
+    path = os.path.join(inputs_dir, f"day{day}.txt")
+    if not os.path.exists(path):
+        return None
+    return load_program(path)
+
+
+def measure(workload: Workload, program_data: List[int], program_class: Type[Program], repeat: int) -> Result:
+    CountingProgram.instructions = 0
+    workload(program_data, CountingProgram)
+    instructions = CountingProgram.instructions
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload(program_data, program_class)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert best is not None
+    return Result(best, instructions)
+
+
+def write_flamegraph(workload: Workload, program_data: List[int], path: str) -> None:
+    StackProfilingProgram.profiles = []
+    workload(program_data, StackProfilingProgram)
+    stack_counts: Counter[Tuple[int, ...]] = Counter()
+    for profile in StackProfilingProgram.profiles:
+        stack_counts.update(profile.stack_counts)
+    with open(path, "w") as fout:
+        for line in collapse_stacks(stack_counts):
+            fout.write(line + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Time the Intcode workloads from each day's recorded input.",
+        epilog="Copy each day's puzzle input to INPUTS/dayN.txt, then record a baseline on a known-good revision with "
+               "'python -m benchmarks --save-baseline'. Later runs fail if a selected workload has no input or no "
+               "baseline entry, or is slower than the baseline by more than the tolerance."
+    )
+    parser.add_argument("workloads", nargs="*", help="workloads to run (default: all)")
+    parser.add_argument("--inputs", default=DEFAULT_INPUTS, help="directory holding dayN.txt program inputs")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed fractional increase in wall time over the baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per workload, the fastest is kept")
+    parser.add_argument("--jit", action="store_true", help="run workloads on JitProgram")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--flamegraph", metavar="DIR", help="also write each workload's inferred Intcode call stacks to DIR/<workload>.folded")
+    args = parser.parse_args()
+
+    names = args.workloads or list(WORKLOADS)
+    unknown = [name for name in names if name not in WORKLOADS]
+    if unknown:
+        parser.error(f"Unknown workloads: {', '.join(unknown)}")
+    program_class = JitProgram if args.jit else Program
+
+    baseline: Dict[str, Dict[str, float]] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as fin:
+            baseline = json.load(fin)
+
+    results: Dict[str, Result] = {}
+    regressions = []
+    missing = []
+    for name in names:
+        day, workload = WORKLOADS[name]
+        program_data = load_input(args.inputs, day)
+        if program_data is None:
+            print(f"{name:6} no input at {os.path.join(args.inputs, f'day{day}.txt')}")
+            missing.append(name)
+            continue
+        result = measure(workload, program_data, program_class, args.repeat)
+        results[name] = result
+        line = f"{name:6} {result.wall_time:9.3f}s {result.instructions:12,} instructions {result.instructions_per_second():14,.0f} ips"
+        if name in baseline:
+            expected = baseline[name]["wall_time"]
+            line += f" {expected / result.wall_time - 1:+7.1%} speed vs baseline"
+            if result.wall_time > expected * (1 + args.tolerance):
+                regressions.append(name)
+                line += " REGRESSION"
+        elif not args.save_baseline:
+            missing.append(name)
+            line += " NO BASELINE"
+        print(line)
+        if args.flamegraph:
+            os.makedirs(args.flamegraph, exist_ok=True)
+            write_flamegraph(workload, program_data, os.path.join(args.flamegraph, f"{name}.folded"))
+
+    if args.save_baseline:
+        baseline.update({name: result.to_dict() for name, result in results.items()})
+        with open(args.baseline, "w") as fout:
+            json.dump(baseline, fout, indent=4, sort_keys=True)
+
+    if missing:
+        print(f"Missing input or baseline: {', '.join(missing)}")
+    if regressions:
+        print(f"Slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+    if missing or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
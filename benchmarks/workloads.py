@@ -0,0 +1,94 @@
+from typing import Callable, Dict, List, Tuple, Type
+
+import day2
+import day5
+import day7
+import day9
+import day11
+import day13
+import day15
+import day17
+import day19
+import day21
+import day23
+import day25
+from intcode_computer import Program, ProgramImage
+
+# Each workload drives the same functions as the day's script, minus the display and file I/O
+Workload = Callable[[List[int], Type[Program]], None]
+
+
+def day2_grid(program_data: List[int], program_class: Type[Program]) -> None:
+    image = ProgramImage(program_data)
+    for noun in range(100):
+        for verb in range(100):
+            day2.run_program_with_args(image, noun, verb, program_class)
+
+
+def day5_diagnostic(program_data: List[int], program_class: Type[Program]) -> None:
+    day5.run_diagnostic(program_data, 1, program_class)
+    day5.run_diagnostic(program_data, 5, program_class)
+
+
+def day7_amplifiers(program_data: List[int], program_class: Type[Program]) -> None:
+    image = ProgramImage(program_data)
+    day7.max_thruster_signal(image, program_class)
+    day7.max_feedback_signal(image, program_class)
+
+
+def day9_boost(program_data: List[int], program_class: Type[Program]) -> None:
+    day9.run_boost(program_data, 1, program_class)
+    day9.run_boost(program_data, 2, program_class)
+
+
+def day11_robot(program_data: List[int], program_class: Type[Program]) -> None:
+    day11.run(program_data, False, program_class)
+    day11.run(program_data, True, program_class)
+
+
+def day13_breakout(program_data: List[int], program_class: Type[Program]) -> None:
+    day13.play(program_data, program_class)
+
+
+def day15_search(program_data: List[int], program_class: Type[Program]) -> None:
+    day15.explore(program_data, program_class)
+
+
+def day17_scaffold(program_data: List[int], program_class: Type[Program]) -> None:
+    day17.collect_dust(program_data, program_class)
+
+
+def day19_beam(program_data: List[int], program_class: Type[Program]) -> None:
+    beam = day19.TractorBeam(program_data, program_class=program_class)
+    beam.count_pulled(50)
+    beam.find_space(100)
+
+
+def day21_springdroid(program_data: List[int], program_class: Type[Program]) -> None:
+    image = ProgramImage(program_data)
+    for commands in (day21.part1, day21.part2):
+        day21.run_springscript(image, commands, program_class)
+
+
+def day23_network(program_data: List[int], program_class: Type[Program]) -> None:
+    day23.run_network(ProgramImage(program_data), program_class)
+
+
+def day25_adventure(program_data: List[int], program_class: Type[Program]) -> None:
+    day25.explore(ProgramImage(program_data), program_class)
+
+
+WORKLOADS: Dict[str, Tuple[int, Workload]] = {
+    "day2": (2, day2_grid),
+    "day5": (5, day5_diagnostic),
+    "day7": (7, day7_amplifiers),
+    "day9": (9, day9_boost),
+    "day11": (11, day11_robot),
+    "day13": (13, day13_breakout),
+    "day15": (15, day15_search),
+    "day17": (17, day17_scaffold),
+    "day19": (19, day19_beam),
+    "day21": (21, day21_springdroid),
+    "day23": (23, day23_network),
+    "day25": (25, day25_adventure)
+}
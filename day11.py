@@ -1,7 +1,8 @@
 from collections import defaultdict
 from enum import Enum
 from intcode_computer import Program
-from typing import Dict, List, Tuple
+from intcode_loader import load_program
+from typing import Dict, List, Tuple, Type
 
 INPUT = "input"
 
@@ -37,9 +38,9 @@ class Robot:
         self.pos = (x + dx, y + dy)
 
 
-def run(program_data: List[int], white_start: bool) -> Dict[Tuple[int, int], bool]:
+def run(program_data: List[int], white_start: bool, program_class: Type[Program] = Program) -> Dict[Tuple[int, int], bool]:
     robot = Robot()
-    program = Program(program_data)
+    program = program_class(program_data)
     tiles: Dict[Tuple[int, int], bool] = defaultdict(bool)
     if white_start:
         tiles[(0, 0)] = True
@@ -72,9 +73,8 @@ def print_tiles(tiles: Dict[Tuple[int, int], bool]) -> None:
 if __name__ == "__main__":
     robot = Robot()
 
-    with open(INPUT, "r") as fin:
-        program_data = [int(x) for x in fin.readline().split(",")]
+    program_data = load_program(INPUT)
 
-    print(len(run(program_data[:], False)))
-    p2_result = run(program_data[:], True)
+    print(len(run(program_data, False)))
+    p2_result = run(program_data, True)
     print_tiles(p2_result)
@@ -1,8 +1,17 @@
+import os
+from contextlib import nullcontext
 from enum import Enum
-from intcode_computer import Program
-from typing import Dict, Tuple
+from intcode_computer import Program, RunStatus
+from intcode_loader import load_program
+from intcode_loops import summarize_loops
+from intcode_trace import enable_tracing
+from typing import BinaryIO, Dict, List, Optional, Tuple, Type
 
 INPUT = "input"
+TRACE_ENV = "INTCODE_TRACE"
+TRACE = "breakout.trace"
+CHECKPOINT_INTERVAL = 100000
+INPUT_BATCH = 1024
 
 
 class Tile(Enum):
@@ -28,6 +37,7 @@ class Board:
         self.score = 0
         self.block_count = 0
         self.paddle_x = 0
+        self.paddle_y = 0
         self.ball_x = 0
 
     def set_tile(self, x: int, y: int, tile: Tile) -> None:
@@ -36,9 +46,23 @@ class Board:
             self.block_count += 1
         elif tile == Tile.Paddle:
             self.paddle_x = x
+            self.paddle_y = y
         elif tile == Tile.Ball:
             self.ball_x = x
 
+    def size(self) -> Tuple[int, int]:
+        return max(x for x, y in self.board.keys()) + 1, max(y for x, y in self.board.keys()) + 1
+
+    def cells(self) -> List[int]:
+        width, height = self.size()
+        return [self.board.get((x, y), Tile.Empty).value for y in range(height) for x in range(width)]
+
+    def load_cells(self, cells: List[int], width: int) -> None:
+        self.board = {}
+        self.block_count = 0
+        for i, value in enumerate(cells):
+            self.set_tile(i % width, i // width, Tile(value))
+
     def next_move(self) -> int:
         if self.paddle_x > self.ball_x:
             return -1
@@ -47,38 +71,87 @@ class Board:
         return 0
 
     def __str__(self) -> str:
-        width = max(x for x, y in self.board.keys())
-        height = max(y for x, y in self.board.keys())
-        board = "\n".join("".join(SYMBOLS[self.board[(x, y)]] for x in range(width + 1)) for y in range(height + 1))
+        width, height = self.size()
+        board = "\n".join("".join(SYMBOLS[self.board[(x, y)]] for x in range(width)) for y in range(height))
         return f"{self.score}\n{board}\n"
 
 
-def main() -> None:
-    with open(INPUT, "r") as fin:
-        program_data = [int(x) for x in fin.readline().split(",")]
-    program_data[0] = 2
-    program = Program(program_data)
-
-    board = Board()
-    for x, y, tile in zip(program, program, program):
-        if x == -1:
+def play_paddle_wall(program: Program, board: Board) -> bool:
+    # Games that keep their screen in memory usually bounce the ball off whatever is drawn there,
+    # so with the whole paddle row filled in they win without any steering. Played on a fork,
+    # and only kept if no blocks are left at the end
+    width, height = board.size()
+    screen = program.find_sequence(board.cells())
+    if screen is None:
+        return False
+    program = program.fork()
+    paddle_row = screen + board.paddle_y * width
+    for address in program.find(Tile.Empty.value, paddle_row, paddle_row + width):
+        program[address] = Tile.Paddle.value
+
+    score = board.score
+    while True:
+        status, outputs = program.run_until_blocked()
+        output = iter(outputs)
+        for x, y, val in zip(output, output, output):
+            if x == -1 and y == 0:
+                score = val
+        if status is RunStatus.HALTED:
             break
-        board.set_tile(x, y, Tile(tile))
-    print(board)
+        program.send_inputs([0] * INPUT_BATCH)
+    if program.count(Tile.Block.value, screen, screen + width * height) > 0:
+        return False
+    board.load_cells(program.read_range(screen, screen + width * height), width)
+    board.score = score
+    return True
+
 
+def play_frames(program: Program, board: Board) -> None:
     while True:
-        output = program.run_until_input()
+        status, outputs = program.run_until_blocked()
+        output = iter(outputs)
         for x, y, val in zip(output, output, output):
             if x == -1 and y == 0:
                 board.score = val
             else:
                 board.set_tile(x, y, Tile(val))
-        print(board)
-        if program.ended:
+        if status is RunStatus.HALTED:
             break
         program.send_input(board.next_move())
-        program.next_command()
-    print(board)
+
+
+def play(program_data: List[int], program_class: Type[Program] = Program, display: bool = False,
+         trace: Optional[BinaryIO] = None) -> Tuple[int, int]:
+    memory = program_data[:]
+    memory[0] = 2
+    program = program_class(memory)
+    program.fuse_superinstructions()
+    summarize_loops(program)
+    if trace is not None:
+        enable_tracing(program, trace, CHECKPOINT_INTERVAL)
+
+    board = Board()
+    for x, y, tile in program.read_records(3):
+        if x == -1:
+            break
+        board.set_tile(x, y, Tile(tile))
+    if display:
+        print(board)
+    blocks = board.block_count
+
+    if not play_paddle_wall(program, board):
+        play_frames(program, board)
+    if display:
+        print(board)
+    return blocks, board.score
+
+
+def main() -> None:
+    # Set INTCODE_TRACE to record the session to TRACE for later replay
+    with open(TRACE, "wb") if os.environ.get(TRACE_ENV) else nullcontext() as trace:
+        blocks, score = play(load_program(INPUT), display=True, trace=trace)
+    print(blocks)
+    print(score)
 
 
 if __name__ == "__main__":
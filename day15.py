@@ -4,7 +4,8 @@ from collections import defaultdict, deque
 from dataclasses import dataclass
 from enum import Enum
 from intcode_computer import Program
-from typing import Deque, Iterable, List, Optional, Tuple
+from intcode_loader import load_program
+from typing import Deque, Iterable, List, Optional, Tuple, Type
 
 INPUT = "input"
 
@@ -66,9 +67,10 @@ def neighbours(pos: Point) -> List[Tuple[Point, Movement]]:
 
 
 class Robot:
-    def __init__(self, program: List[int]) -> None:
+    def __init__(self, program: List[int], program_class: Type[Program] = Program, display: bool = False) -> None:
         self.position = Point(0, 0)
-        self.program = Program(program)
+        self.program = program_class(program)
+        self.display = display
         self.status: Optional[Status] = None
         self.grid = defaultdict(lambda: Cell.Unknown, {Point(0, 0): Cell.Floor})
         self.to_explore = deque([p for p, m in neighbours(self.position)])
@@ -85,7 +87,8 @@ class Robot:
 
     def search(self) -> Point:
         while self.to_explore:
-            print(self)
+            if self.display:
+                print(self)
             to_explore = self.to_explore.popleft()
             for movement in self.shortest_path(self.position, to_explore):
                 self.move(movement)
@@ -113,7 +116,8 @@ class Robot:
         to_visit = {start}
 
         while True:
-            print(self)
+            if self.display:
+                print(self)
             to_visit = {n for p in to_visit for n, m in neighbours(p) if self.grid[n] == Cell.Floor}
             self.grid.update({n: Cell.Oxygen for n in to_visit})
             if not to_visit:
@@ -130,14 +134,16 @@ class Robot:
         return "\n".join(result)
 
 
-def main() -> None:
-    with open(INPUT, "r") as fin:
-        program_data = [int(x) for x in fin.readline().strip().split(",")]
-    robot = Robot(program_data)
-
+def explore(program_data: List[int], program_class: Type[Program] = Program, display: bool = False) -> Tuple[int, int]:
+    robot = Robot(program_data, program_class, display)
     oxygen_position = robot.search()
     spread_time = robot.spread_oxygen(oxygen_position)
-    print(len(robot.shortest_path(Point(0, 0), oxygen_position)))
+    return len(robot.shortest_path(Point(0, 0), oxygen_position)), spread_time
+
+
+def main() -> None:
+    distance, spread_time = explore(load_program(INPUT), display=True)
+    print(distance)
     print(spread_time)
 
 
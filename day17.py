@@ -1,7 +1,18 @@
-from intcode_computer import Program
-from typing import Iterator, List, Tuple
+from intcode_computer import Program, ProgramImage, ascii_lines
+from intcode_loader import load_program
+from intcode_warm_start import warm_start
+from typing import Iterable, Iterator, List, Optional, Tuple, Type
 
 INPUT = "input"
+WARM_START = "scaffold.warm"
+
+MOVEMENT_ROUTINES = [
+    "A,A,B,C,C,A,C,B,C,B",
+    "L,4,L,4,L,6,R,10,L,6",
+    "L,12,L,6,R,10,L,6",
+    "R,8,R,10,L,6",
+    "n"
+]
 
 
 def find_intersections(image: str) -> Iterator[Tuple[int, int]]:
@@ -12,40 +23,39 @@ def find_intersections(image: str) -> Iterator[Tuple[int, int]]:
                 yield x, y
 
 
-def read_image(program: Program) -> str:
+def read_image(lines: Iterable[str]) -> str:
     result: List[str] = []
-    for line in program.read_lines():
+    for line in lines:
         if not line.strip():
             return "\n".join(result)
         result.append(line)
     raise Exception("Expected blank line")
 
 
-def main() -> None:
-    with open(INPUT, "r") as fin:
-        program_data = [int(c) for c in fin.readline().strip().split(",")]
-
-    program_data[0] = 2
-    program = Program(program_data[:])
-    image = read_image(program)
-    print(image)
-    intersections = find_intersections(image)
-    print(sum(x * y for x, y in intersections))
-    program.read_line()
-    program.write_string("A,A,B,C,C,A,C,B,C,B")
-    program.read_line()
-    program.write_string("L,4,L,4,L,6,R,10,L,6")
-    program.read_line()
-    program.write_string("L,12,L,6,R,10,L,6")
-    program.read_line()
-    program.write_string("R,8,R,10,L,6")
-    program.read_line()
-    program.write_string("n")
+def collect_dust(program_data: List[int], program_class: Type[Program] = Program,
+                 warm_start_path: Optional[str] = None) -> Tuple[str, str, int]:
+    memory = program_data[:]
+    memory[0] = 2
+    program, prologue = warm_start(ProgramImage(memory), warm_start_path, program_class=program_class)
+    image = read_image(ascii_lines(prologue))
+    # The prologue already read the "Main:" prompt, so each routine is followed by the next prompt
+    *routines, video_feed = MOVEMENT_ROUTINES
+    for routine in routines:
+        program.write_string(routine)
+        program.read_line()
+    program.write_string(video_feed)
     next(program)
 
-    image = read_image(program)
+    final_image = read_image(program.read_lines())
+    return image, final_image, next(program)
+
+
+def main() -> None:
+    image, final_image, dust = collect_dust(load_program(INPUT), warm_start_path=WARM_START)
     print(image)
-    print(next(program))
+    print(sum(x * y for x, y in find_intersections(image)))
+    print(final_image)
+    print(dust)
 
 
 if __name__ == "__main__":
@@ -1,26 +1,41 @@
 import itertools
 
 from intcode_computer import Program
-from typing import Dict, Iterator, List, Tuple
+from intcode_cache import RunCache, program_digest
+from intcode_loader import load_program
+from intcode_pool import run_many
+from typing import Dict, Iterator, List, Optional, Tuple, Type
 
 INPUT = "input"
+CACHE = "runs.sqlite"
 
 
 class TractorBeam:
-    def __init__(self, program_data: List[int]) -> None:
-        self.program_data = program_data
+    def __init__(self, program_data: List[int], cache: Optional[RunCache] = None, program_class: Type[Program] = Program) -> None:
+        self.cache = cache
+        self.digest = program_digest(program_data)
+        self.program = program_class(program_data)
+        self.program.run_until_blocked()
         self.beam_spaces: Dict[Tuple[int, int], bool] = {}
 
     def get_cell(self, x: int, y: int) -> bool:
         if (x, y) in self.beam_spaces:
             return self.beam_spaces[(x, y)]
-        program = Program(self.program_data[:])
-        program.send_input(x)
-        program.send_input(y)
-        pulled = bool(program.next_output())
+        outputs = self.cache.lookup(self.digest, [x, y]) if self.cache is not None else None
+        if outputs is None:
+            program = self.program.fork()
+            program.send_input(x)
+            program.send_input(y)
+            outputs = [program.next_output()]
+            if self.cache is not None:
+                self.cache.store(self.digest, [x, y], outputs)
+        pulled = bool(outputs[0])
         self.beam_spaces[(x, y)] = pulled
         return pulled
 
+    def count_pulled(self, size: int) -> int:
+        return sum(self.get_cell(x, y) for y in range(size) for x in range(size))
+
     def space_fits(self, start_x: int, start_y: int, size: int) -> bool:
         for y in range(start_y, start_y + size):
             for x in range(start_x, start_x + size):
@@ -53,12 +68,12 @@ class TractorBeam:
 
 
 def main() -> None:
-    with open(INPUT, "r") as fin:
-        program_data = [int(x) for x in fin.readline().strip().split(",")]
+    program_data = load_program(INPUT)
 
-    beam = TractorBeam(program_data)
-    print(sum(beam.get_cell(x, y) for y in range(50) for x in range(50)))
-    x, y = beam.find_space(100)
+    print(sum(output[0] for output in run_many(INPUT, [[x, y] for y in range(50) for x in range(50)])))
+    with RunCache(path=CACHE) as cache:
+        beam = TractorBeam(program_data, cache)
+        x, y = beam.find_space(100)
     print(x * 10000 + y)
 
 
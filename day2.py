@@ -1,28 +1,57 @@
-from typing import List
-from intcode_computer import run
+from typing import List, Optional, Type
+from intcode_computer import Program, ProgramImage
+from intcode_loader import load_program
+from intcode_symbolic import SymbolicError, SymbolicProgram, solve
+from intcode_vector import VectorProgram
 
 INPUT = "input"
 TARGET = 19690720
 
 
-def run_program_with_args(program: List[int], noun: int, verb: int) -> int:
-    program[1] = noun
-    program[2] = verb
-    program_copy = program[:]
-    run(program_copy)
-    return program_copy[0]
+def run_program_with_args(image: ProgramImage, noun: int, verb: int, program_class: Type[Program] = Program) -> int:
+    computer = program_class(image)
+    computer[1] = noun
+    computer[2] = verb
+    computer.run_to_end()
+    return computer[0]
+
+
+def solve_symbolically(program: List[int]) -> Optional[int]:
+    symbolic = SymbolicProgram(program, {1: "noun", 2: "verb"})
+    symbolic.run()
+    result = symbolic.value(0)
+    for solution in solve(result, TARGET, {"noun": range(100), "verb": range(100)}, symbolic.conditions):
+        return solution["noun"] * 100 + solution["verb"]
+    return None
+
+
+def search_grid(program: List[int]) -> Optional[int]:
+    pairs = [(noun, verb) for noun in range(100) for verb in range(100)]
+    lanes = VectorProgram(program, len(pairs))
+    lanes.set_cell(1, [noun for noun, verb in pairs])
+    lanes.set_cell(2, [verb for noun, verb in pairs])
+    lanes.run()
+    for (noun, verb), result in zip(pairs, lanes.cell(0)):
+        if result == TARGET:
+            return noun * 100 + verb
+    return None
 
 
 def main() -> None:
-    with open(INPUT, "r") as fin:
-        program = [int(x) for x in fin.readline().split(",")]
-    print(run_program_with_args(program, 12, 2))
-
-    for noun in range(100):
-        for verb in range(100):
-            if run_program_with_args(program, noun, verb) == TARGET:
-                print(noun * 100 + verb)
-                return
+    program = load_program(INPUT)
+    image = ProgramImage(program)
+    print(run_program_with_args(image, 12, 2))
+
+    try:
+        answer = solve_symbolically(program)
+    except SymbolicError as e:
+        print(f"Falling back to brute force: {e}")
+    else:
+        if answer is not None:
+            print(answer)
+            return
+
+    print(search_grid(program))
 
 
 if __name__ == "__main__":
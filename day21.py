@@ -1,8 +1,11 @@
-from intcode_computer import Program
+from intcode_computer import Program, ProgramImage, ascii_lines
+from intcode_loader import map_image
+from intcode_warm_start import warm_start
 
-from typing import List, Optional
+from typing import List, Optional, Tuple, Type
 
 INPUT = "input"
+WARM_START = "springdroid.warm"
 
 part1 = [
     # If B or C is a hole and D is ground jump to D
@@ -34,27 +37,31 @@ part2 = [
 ]
 
 
-def run(program: Program, commands: List[str]) -> Optional[int]:
-    print(program.read_line())
+def run(program: Program, commands: List[str]) -> Tuple[List[str], Optional[int]]:
     for c in commands:
         program.write_string(c)
-    print(program.read_line())
-    print(program.read_line())
-    print(program.read_line())
+    lines = [line for line in (program.read_line() for _ in range(3)) if line is not None]
     ret = next(program)
     if ret == 10:
-        for line in program.read_lines():
-            print(line)
-        return None
+        lines.extend(program.read_lines())
+        return lines, None
 
-    return ret
+    return lines, ret
+
+
+def run_springscript(image: ProgramImage, commands: List[str], program_class: Type[Program] = Program,
+                     warm_start_path: Optional[str] = None) -> Tuple[List[str], Optional[int]]:
+    program, prologue = warm_start(image, warm_start_path, program_class=program_class)
+    lines, damage = run(program, commands)
+    return ascii_lines(prologue) + lines, damage
 
 
 def main() -> None:
-    with open(INPUT, "r") as fin:
-        program_data = [int(x) for x in fin.readline().strip().split(",")]
-    print(run(Program(program_data[:]), part1))
-    print(run(Program(program_data[:]), part2))
+    image = map_image(INPUT)
+    for springscript in (part1, part2):
+        lines, damage = run_springscript(image, springscript, warm_start_path=WARM_START)
+        print("\n".join(lines))
+        print(damage)
 
 
 if __name__ == "__main__":
@@ -1,43 +1,51 @@
-from intcode_computer import Program
-from itertools import chain
-from typing import Set
+from intcode_computer import Program, ProgramImage
+from intcode_loader import map_image
+from intcode_scheduler import Scheduler
+from typing import List, Optional, Set, Tuple, Type
 
 INPUT = "input"
+NETWORK_SIZE = 50
+NAT_ADDRESS = 255
 
 
-def main() -> None:
-    with open(INPUT, "r") as fin:
-        program_data = [int(x) for x in fin.readline().strip().split(",")]
+def run_network(image: ProgramImage, program_class: Type[Program] = Program) -> Tuple[int, int]:
+    first_nat: Optional[int] = None
+    last_nat: Optional[Tuple[int, int]] = None
+    nat_history: Set[int] = set()
+    packets: List[List[int]] = [[] for _ in range(NETWORK_SIZE)]
 
-    part1 = False
+    def route(node: int, outputs: List[int]) -> None:
+        nonlocal first_nat, last_nat
+        buffer = packets[node]
+        buffer.extend(outputs)
+        while len(buffer) >= 3:
+            address, x, y = buffer[:3]
+            del buffer[:3]
+            if address == NAT_ADDRESS:
+                if first_nat is None:
+                    first_nat = y
+                last_nat = (x, y)
+            else:
+                scheduler.send(address, [x, y])
+
+    scheduler = Scheduler(route, idle_input=-1)
+    for i in range(NETWORK_SIZE):
+        scheduler.add(program_class(image, [i]))
 
-    computers = [Program(program_data[:], [i]) for i in range(50)]
-    last_nat = None
-    nat_history: Set[int] = set()
     while True:
-        idle = True
-        for computer in computers:
-            computer.send_input(-1)
-            output = chain(computer.consume_all_input(), computer.run_until_input())
-            for address, x, y in zip(output, output, output):
-                if address == 255:
-                    if not part1:
-                        print(y)
-                        part1 = True
-                    last_nat = (x, y)
-                else:
-                    computers[address].send_input(x)
-                    computers[address].send_input(y)
-                idle = False
-        if idle:
-            assert last_nat is not None
-            x, y = last_nat
-            if y in nat_history:
-                print(y)
-                break
-            nat_history.add(y)
-            computers[0].send_input(x)
-            computers[0].send_input(y)
+        scheduler.run_until_idle()
+        assert first_nat is not None and last_nat is not None
+        x, y = last_nat
+        if y in nat_history:
+            return first_nat, y
+        nat_history.add(y)
+        scheduler.send(0, [x, y])
+
+
+def main() -> None:
+    first_nat, repeated_nat = run_network(map_image(INPUT))
+    print(first_nat)
+    print(repeated_nat)
 
 
 if __name__ == "__main__":
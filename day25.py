@@ -1,10 +1,20 @@
 import itertools
+import os
 from collections import deque
-from intcode_computer import Program
-from typing import Deque, Iterable
+from contextlib import nullcontext
+from intcode_computer import Program, ProgramImage, ascii_lines
+from intcode_loader import map_image
+from intcode_loops import summarize_loops
+from intcode_trace import enable_tracing
+from intcode_warm_start import warm_start
+from typing import BinaryIO, Deque, Iterable, List, Optional, Type
 
 
 INPUT = "input"
+TRACE_ENV = "INTCODE_TRACE"
+TRACE = "adventure.trace"
+WARM_START = "adventure.warm"
+CHECKPOINT_INTERVAL = 100000
 
 START_COMMANDS = [
     "north",
@@ -53,23 +63,37 @@ def brute_force_door() -> Iterable[str]:
                 yield f"drop {item}"
 
 
-def run(program: Program, input_data: Deque[str]) -> None:
+def run(program: Program, prologue: List[str], input_data: Deque[str], display: bool = False) -> Optional[str]:
     bf_door = brute_force_door()
-    for line in program.read_lines():
-        print(line)
+    last_line = None
+    for line in itertools.chain(prologue, program.read_lines()):
+        if display:
+            print(line)
         if line == "Command?":
             if input_data:
                 command = input_data.popleft()
             else:
                 command = next(bf_door)
-            print(command)
+            if display:
+                print(command)
             program.write_string(command)
+        elif line:
+            last_line = line
+    return last_line
+
+
+def explore(image: ProgramImage, program_class: Type[Program] = Program, display: bool = False,
+            warm_start_path: Optional[str] = None, trace: Optional[BinaryIO] = None) -> Optional[str]:
+    program, prologue = warm_start(image, warm_start_path, summarize_loops, program_class)
+    if trace is not None:
+        enable_tracing(program, trace, CHECKPOINT_INTERVAL)
+    return run(program, ascii_lines(prologue), deque(START_COMMANDS), display)
 
 
 def main() -> None:
-    with open(INPUT, "r") as fin:
-        program_data = [int(x) for x in fin.readline().strip().split(",")]
-    run(Program(program_data), deque(START_COMMANDS))
+    # Set INTCODE_TRACE to record the session to TRACE for later replay
+    with open(TRACE, "wb") if os.environ.get(TRACE_ENV) else nullcontext() as trace:
+        explore(map_image(INPUT), display=True, warm_start_path=WARM_START, trace=trace)
 
 
 if __name__ == "__main__":
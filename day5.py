@@ -1,13 +1,19 @@
-from intcode_computer import run
+from intcode_computer import Program
+from intcode_loader import load_program
+from typing import List, Optional, Type
 
 INPUT = "input"
 
 
+def run_diagnostic(program: List[int], system_id: int, program_class: Type[Program] = Program) -> Optional[int]:
+    outputs = list(program_class(program, [system_id]))
+    return outputs[-1] if outputs else None
+
+
 def main() -> None:
-    with open(INPUT, "r") as fin:
-        program = [int(x) for x in fin.readline().split(",")]
-    print(run(program[:], [1]))
-    print(run(program[:], [5]))
+    program = load_program(INPUT)
+    print(run_diagnostic(program, 1))
+    print(run_diagnostic(program, 5))
 
 
 if __name__ == "__main__":
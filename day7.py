@@ -1,42 +1,63 @@
+import asyncio
 import itertools
-from intcode_computer import run, Program
+from intcode_async import AsyncProgram, async_program_class
+from intcode_computer import Program, ProgramImage, Specializer
+from intcode_loader import map_image
+from typing import Optional, Sequence, Type
 
 INPUT = "input"
 
 
-def main() -> None:
-    with open(INPUT, "r") as fin:
-        program = [int(x) for x in fin.readline().strip().split(",")]
+async def connect(source: AsyncProgram, destination: AsyncProgram) -> Optional[int]:
+    signal = None
+    while True:
+        output = await source.recv_output()
+        if output is None:
+            return signal
+        destination.send_input(output)
+        signal = output
+
+
+async def run_feedback_loop(specializer: Specializer[AsyncProgram], order: Sequence[int]) -> Optional[int]:
+    amplifiers = [specializer.specialize([phase_setting])[0] for phase_setting in order]
+    amplifiers[0].send_input(0)
+    results = await asyncio.gather(
+        *(amplifier.run() for amplifier in amplifiers),
+        *(connect(amplifier, amplifiers[(i + 1) % len(amplifiers)]) for i, amplifier in enumerate(amplifiers))
+    )
+    return results[-1]
+
+
+def max_thruster_signal(image: ProgramImage, program_class: Type[Program] = Program) -> Optional[int]:
+    specializer = Specializer(program_class(image))
 
     max_output = None
     for order in itertools.permutations(range(5)):
         signal = 0
         for phase_setting in order:
-            result = run(program[:], [phase_setting, signal])
-            if result is None:
-                raise Exception("No return value")
-            signal = result
+            amplifier, _ = specializer.specialize([phase_setting])
+            amplifier.send_input(signal)
+            signal = amplifier.next_output()
         max_output = signal if max_output is None else max(signal, max_output)
-    print(max_output)
+    return max_output
+
+
+def max_feedback_signal(image: ProgramImage, program_class: Type[Program] = Program) -> Optional[int]:
+    feedback_specializer = Specializer(async_program_class(program_class)(image))
 
     max_output = None
     for order in itertools.permutations(range(5, 10)):
-        signal = 0
-        current_amplifier = 0
-        amplifiers = []
-        for phase_setting in order:
-            p = Program(program[:], [phase_setting])
-            amplifiers.append(p)
-
-        while True:
-            amplifiers[current_amplifier].send_input(signal)
-            new_signal = amplifiers[current_amplifier].next_output_or_end()
-            if new_signal is None:
-                break
-            signal = new_signal
-            current_amplifier = (current_amplifier + 1) % len(amplifiers)
-        max_output = signal if max_output is None else max(signal, max_output)
-    print(max_output)
+        output = asyncio.run(run_feedback_loop(feedback_specializer, order))
+        if output is None:
+            raise Exception("No return value")
+        max_output = output if max_output is None else max(output, max_output)
+    return max_output
+
+
+def main() -> None:
+    image = map_image(INPUT)
+    print(max_thruster_signal(image))
+    print(max_feedback_signal(image))
 
 
 if __name__ == "__main__":
@@ -1,13 +1,22 @@
-from intcode_computer import run
+from typing import List, Optional, Type
+from intcode_computer import Program
+from intcode_loader import load_program
+from intcode_loops import summarize_loops
 
 INPUT = "input"
 
 
+def run_boost(program: List[int], mode: int, program_class: Type[Program] = Program) -> Optional[int]:
+    computer = program_class(program, [mode])
+    summarize_loops(computer)
+    outputs = list(computer)
+    return outputs[-1] if outputs else None
+
+
 def main() -> None:
-    with open(INPUT, "r") as fin:
-        program = [int(x) for x in fin.readline().split(",")]
-        print(run(program[:], [1]))
-        print(run(program[:], [2]))
+    program = load_program(INPUT)
+    print(run_boost(program, 1))
+    print(run_boost(program, 2))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+import asyncio
+from functools import cache
+from typing import Iterable, List, Optional, Type
+
+from intcode_computer import Program, ProgramSource, RunStatus
+
+
+class AsyncProgram(Program):
+    # Input still goes through the same deque as on a plain Program, so the synchronous API keeps
+    # working; sending input also wakes run() if it is waiting for some
+    def __init__(self, program: ProgramSource, input_data: Optional[List[int]] = None) -> None:
+        super().__init__(program, input_data)
+        self.input_ready = asyncio.Event()
+        self.output_queue: asyncio.Queue[Optional[int]] = asyncio.Queue()
+
+    def send_input(self, input_data: int) -> None:
+        super().send_input(input_data)
+        self.input_ready.set()
+
+    def send_inputs(self, input_data: Iterable[int]) -> None:
+        super().send_inputs(input_data)
+        self.input_ready.set()
+
+    def fork(self) -> "AsyncProgram":
+        clone = super().fork()
+        clone.input_ready = asyncio.Event()
+        clone.output_queue = asyncio.Queue()
+        return clone
+
+    async def recv_output(self) -> Optional[int]:
+        return await self.output_queue.get()
+
+    async def run(self) -> None:
+        while True:
+            status, outputs = self.run_until_blocked()
+            for output in outputs:
+                self.output_queue.put_nowait(output)
+            if status is RunStatus.HALTED:
+                break
+            await asyncio.sleep(0)
+            self.input_ready.clear()
+            if not self.input:
+                await self.input_ready.wait()
+        self.output_queue.put_nowait(None)
+
+
+@cache
+def async_program_class(program_class: Type[Program]) -> Type[AsyncProgram]:
+    # Mixes AsyncProgram into another Program subclass, so e.g. a JitProgram can take part in asyncio pipelines
+    if issubclass(program_class, AsyncProgram):
+        return program_class
+    return type(f"Async{program_class.__name__}", (AsyncProgram, program_class), {})
@@ -0,0 +1,72 @@
+import hashlib
+import sqlite3
+from collections import OrderedDict
+from types import TracebackType
+from typing import List, Optional, Sequence, Tuple, Type
+
+from intcode_computer import Program
+
+
+def program_digest(program_lines: Sequence[int]) -> str:
+    return hashlib.sha256(",".join(map(str, program_lines)).encode()).hexdigest()
+
+
+class RunCache:
+    def __init__(self, max_entries: int = 4096, path: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        # Outputs are kept as tuples and handed out as fresh lists, so callers cannot change a cached run
+        self.entries: OrderedDict[Tuple[str, Tuple[int, ...]], Tuple[int, ...]] = OrderedDict()
+        self.db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self.db = sqlite3.connect(path)
+            self.db.execute("CREATE TABLE IF NOT EXISTS runs (digest TEXT, inputs TEXT, outputs TEXT, PRIMARY KEY (digest, inputs))")
+
+    def __enter__(self) -> "RunCache":
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc: Optional[BaseException], traceback: Optional[TracebackType]) -> None:
+        self.close()
+
+    def remember(self, key: Tuple[str, Tuple[int, ...]], outputs: Sequence[int]) -> None:
+        self.entries[key] = tuple(outputs)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def lookup(self, digest: str, input_list: Sequence[int]) -> Optional[List[int]]:
+        key = (digest, tuple(input_list))
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return list(self.entries[key])
+        if self.db is not None:
+            row = self.db.execute("SELECT outputs FROM runs WHERE digest = ? AND inputs = ?", (digest, ",".join(map(str, key[1])))).fetchone()
+            if row is not None:
+                outputs = [int(x) for x in row[0].split(",")] if row[0] else []
+                self.remember(key, outputs)
+                return outputs
+        return None
+
+    def store(self, digest: str, input_list: Sequence[int], outputs: Sequence[int]) -> None:
+        key = (digest, tuple(input_list))
+        self.remember(key, outputs)
+        if self.db is not None:
+            self.db.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?)", (digest, ",".join(map(str, key[1])), ",".join(map(str, outputs))))
+
+    def run_to_end(self, program_lines: Sequence[int], input_list: Optional[List[int]] = None, digest: Optional[str] = None) -> List[int]:
+        digest = digest if digest is not None else program_digest(program_lines)
+        inputs = input_list if input_list is not None else []
+        outputs = self.lookup(digest, inputs)
+        if outputs is None:
+            outputs = list(Program(program_lines, inputs[:]))
+            self.store(digest, inputs, outputs)
+        return outputs
+
+    def flush(self) -> None:
+        if self.db is not None:
+            self.db.commit()
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
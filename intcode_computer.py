@@ -1,7 +1,13 @@
+import copy
+import hashlib
+import json
 import operator
-from collections import defaultdict, deque
-from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import time
+from array import array
+from collections import Counter, defaultdict, deque
+from typing import Any, Callable, DefaultDict, Deque, Dict, Generic, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple, TypeVar, Union
 from enum import Enum
+from functools import partial
 
 
 class OpCode(Enum):
@@ -17,18 +23,421 @@ class OpCode(Enum):
     MOVE_RELATIVE_BASE = 9
 
 
+PARAM_COUNTS = {
+    OpCode.END: 0,
+    OpCode.ADD: 3,
+    OpCode.MUL: 3,
+    OpCode.INPUT: 1,
+    OpCode.OUTPUT: 1,
+    OpCode.JUMP_IF_TRUE: 2,
+    OpCode.JUMP_IF_FALSE: 2,
+    OpCode.LESS_THAN: 3,
+    OpCode.EQUALS: 3,
+    OpCode.MOVE_RELATIVE_BASE: 1
+}
+
+Parameter = Tuple[int, int]
+
+
+class RunStatus(Enum):
+    OUTPUT = 1
+    NEEDS_INPUT = 2
+    HALTED = 3
+    PREEMPTED = 4
+    WATCHPOINT = 5
+    LOOPING = 6
+
+
+class InputRequired(Exception):
+    pass
+
+
+class Watchpoint(NamedTuple):
+    start: int
+    end: int
+    reads: bool
+    writes: bool
+    callback: Optional[Callable[["Program", int, int], Optional[bool]]]
+
+
+class WatchpointHit(Exception):
+    def __init__(self, watchpoint: Watchpoint, address: int, output: Optional[int]) -> None:
+        super().__init__(f"Watchpoint hit at address {address}")
+        self.watchpoint = watchpoint
+        self.address = address
+        self.output = output
+
+
+class Instruction(NamedTuple):
+    op: OpCode
+    params: Tuple[Parameter, ...]
+    size: int
+    handler: Callable[["Program", Tuple[Parameter, ...], Optional[int]], Optional[int]]
+    parts: Tuple["Instruction", ...] = ()
+    # Cells the instruction depends on beyond its own size, e.g. the body of a summarized loop
+    extent: int = 0
+
+
+Step = Callable[[], Tuple[bool, Optional[int]]]
+# A hook wraps one step of the program: it gets the rest of the chain and returns its result
+StepHook = Callable[[Step], Tuple[bool, Optional[int]]]
+
+
+PAGE_BITS = 9
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+# Pages below this are kept in a list; a write further out goes to a dict, so one far-off
+# address does not allocate a page table slot for every page below it
+DENSE_PAGES = 1 << 10
+
+Page = Union["array[int]", List[int], memoryview]
+SparsePages = Tuple[Tuple[int, Page], ...]
+
+
+def make_page(values: Sequence[int] = ()) -> Page:
+    page: Page
+    try:
+        page = array("q", values)
+    except OverflowError:
+        page = list(values)
+    page.extend([0] * (PAGE_SIZE - len(values)))
+    return page
+
+
+ZERO_PAGE = make_page()
+
+
+class PagedMemory:
+    def __init__(self, data: Sequence[int] = ()) -> None:
+        self.pages: List[Page] = [make_page(data[start:start + PAGE_SIZE]) for start in range(0, len(data), PAGE_SIZE)]
+        self.owned = [True] * len(self.pages)
+        self.sparse: Dict[int, Page] = {}
+        self.sparse_owned: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.pages) * PAGE_SIZE
+
+    def __getitem__(self, idx: int) -> int:
+        page_num = idx >> PAGE_BITS
+        if 0 <= page_num < len(self.pages):
+            return self.pages[page_num][idx & PAGE_MASK]
+        page = self.sparse.get(page_num)
+        return page[idx & PAGE_MASK] if page is not None else 0
+
+    def fetch(self, idx: int) -> int:
+        return PagedMemory.__getitem__(self, idx)
+
+    def __setitem__(self, idx: int, val: int) -> None:
+        if idx < 0:
+            raise Exception(f"Tried to write to negative address {idx}")
+        page_num = idx >> PAGE_BITS
+        pages = self.pages
+        if page_num >= len(pages):
+            if page_num >= DENSE_PAGES:
+                self.set_sparse(page_num, idx & PAGE_MASK, val)
+                return
+            self.owned.extend([False] * (page_num + 1 - len(pages)))
+            pages.extend([ZERO_PAGE] * (page_num + 1 - len(pages)))
+        page = pages[page_num]
+        if not self.owned[page_num]:
+            page = pages[page_num] = make_page(page)
+            self.owned[page_num] = True
+        try:
+            page[idx & PAGE_MASK] = val
+        except OverflowError:
+            page = pages[page_num] = list(page)
+            page[idx & PAGE_MASK] = val
+
+    def set_sparse(self, page_num: int, offset: int, val: int) -> None:
+        page = self.sparse.get(page_num)
+        if page is None or page_num not in self.sparse_owned:
+            page = self.sparse[page_num] = make_page(page if page is not None else ())
+            self.sparse_owned.add(page_num)
+        try:
+            page[offset] = val
+        except OverflowError:
+            page = self.sparse[page_num] = list(page)
+            page[offset] = val
+
+    def snapshot(self) -> Tuple[Page, ...]:
+        self.owned = [False] * len(self.pages)
+        return tuple(self.pages)
+
+    def sparse_snapshot(self) -> SparsePages:
+        self.sparse_owned = set()
+        return tuple(sorted(self.sparse.items()))
+
+    def restore(self, pages: Tuple[Page, ...], sparse: SparsePages = ()) -> None:
+        self.pages[:] = pages
+        self.owned = [False] * len(pages)
+        self.sparse = dict(sparse)
+        self.sparse_owned = set()
+
+
+class WatchedMemory(PagedMemory):
+    def __init__(self, inner: PagedMemory, program: "Program") -> None:
+        self.inner = inner
+        self.pages = inner.pages
+        self.program = program
+        self.watchpoints: List[Watchpoint] = []
+        self.read_watchpoints: List[Watchpoint] = []
+        self.write_watchpoints: List[Watchpoint] = []
+        self.hit: Optional[Tuple[Watchpoint, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.inner)
+
+    def add(self, watchpoint: Watchpoint) -> None:
+        self.watchpoints.append(watchpoint)
+        self.read_watchpoints = [w for w in self.watchpoints if w.reads]
+        self.write_watchpoints = [w for w in self.watchpoints if w.writes]
+
+    def remove(self, watchpoint: Watchpoint) -> None:
+        self.watchpoints.remove(watchpoint)
+        self.read_watchpoints = [w for w in self.watchpoints if w.reads]
+        self.write_watchpoints = [w for w in self.watchpoints if w.writes]
+
+    def check(self, watchpoints: List[Watchpoint], idx: int, val: int) -> None:
+        for watchpoint in watchpoints:
+            if watchpoint.start <= idx < watchpoint.end:
+                if watchpoint.callback is None or watchpoint.callback(self.program, idx, val):
+                    self.hit = (watchpoint, idx)
+
+    def __getitem__(self, idx: int) -> int:
+        val = self.inner[idx]
+        if self.read_watchpoints:
+            self.check(self.read_watchpoints, idx, val)
+        return val
+
+    def __setitem__(self, idx: int, val: int) -> None:
+        self.inner[idx] = val
+        if self.write_watchpoints:
+            self.check(self.write_watchpoints, idx, val)
+
+    def fetch(self, idx: int) -> int:
+        return self.inner[idx]
+
+    def snapshot(self) -> Tuple[Page, ...]:
+        return self.inner.snapshot()
+
+    def sparse_snapshot(self) -> SparsePages:
+        return self.inner.sparse_snapshot()
+
+    def restore(self, pages: Tuple[Page, ...], sparse: SparsePages = ()) -> None:
+        self.inner.restore(pages, sparse)
+
+
+def page_hash(page_num: int, page: Page) -> int:
+    if page is ZERO_PAGE:
+        return 0
+    result = 0
+    base = page_num << PAGE_BITS
+    for offset, val in enumerate(page):
+        if val:
+            result ^= hash((base + offset, val))
+    return result
+
+
+class HashedMemory(PagedMemory):
+    # Zobrist-style: the hash is the XOR of a hash per non-zero cell, so a write only has to
+    # swap out the old cell's term for the new one
+    def __init__(self, inner: PagedMemory) -> None:
+        self.inner = inner
+        self.pages = inner.pages
+        self.page_hashes = {page_num: page_hash(page_num, page) for page_num, page in self.all_pages()}
+        self.hash = 0
+        for value in self.page_hashes.values():
+            self.hash ^= value
+
+    def all_pages(self) -> Iterator[Tuple[int, Page]]:
+        yield from enumerate(self.inner.pages)
+        yield from self.inner.sparse.items()
+
+    def __len__(self) -> int:
+        return len(self.inner)
+
+    def __getitem__(self, idx: int) -> int:
+        return self.inner[idx]
+
+    def __setitem__(self, idx: int, val: int) -> None:
+        old = self.inner.fetch(idx)
+        self.inner[idx] = val
+        if old != val:
+            change = (hash((idx, old)) if old else 0) ^ (hash((idx, val)) if val else 0)
+            page_num = idx >> PAGE_BITS
+            self.page_hashes[page_num] = self.page_hashes.get(page_num, 0) ^ change
+            self.hash ^= change
+
+    def fetch(self, idx: int) -> int:
+        return self.inner[idx]
+
+    def snapshot(self) -> Tuple[Page, ...]:
+        return self.inner.snapshot()
+
+    def sparse_snapshot(self) -> SparsePages:
+        return self.inner.sparse_snapshot()
+
+    def restore(self, pages: Tuple[Page, ...], sparse: SparsePages = ()) -> None:
+        # Pages are copied before they are written once shared, so a page object that is
+        # still in place has not changed and keeps its hash
+        old_pages = dict(self.all_pages())
+        self.inner.restore(pages, sparse)
+        page_hashes = {}
+        for page_num, page in self.all_pages():
+            if old_pages.get(page_num) is page:
+                page_hashes[page_num] = self.page_hashes.get(page_num, 0)
+            else:
+                page_hashes[page_num] = page_hash(page_num, page)
+        self.page_hashes = page_hashes
+        self.hash = 0
+        for value in page_hashes.values():
+            self.hash ^= value
+
+
+class ProgramImage:
+    def __init__(self, program: Sequence[int]) -> None:
+        if isinstance(program, memoryview):
+            # Whole pages of a mapped image are shared read-only in place, and a Program copies
+            # one the first time it writes to it; only the short last page needs padding
+            full = len(program) - len(program) % PAGE_SIZE
+            pages: List[Page] = [program[start:start + PAGE_SIZE] for start in range(0, full, PAGE_SIZE)]
+            if full < len(program):
+                pages.append(make_page(program[full:]))
+            self.pages = tuple(pages)
+        else:
+            self.pages = PagedMemory(program).snapshot()
+        self.digest: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.pages) * PAGE_SIZE
+
+    def fingerprint(self) -> str:
+        if self.digest is None:
+            content = hashlib.sha256()
+            for page in self.pages:
+                content.update(",".join(map(str, page)).encode())
+                content.update(b";")
+            self.digest = content.hexdigest()
+        return self.digest
+
+
+ProgramSource = Union[Sequence[int], ProgramImage]
+
+
+class ProgramState(NamedTuple):
+    pages: Tuple[Page, ...]
+    pointer: int
+    relative_base: int
+    input: Tuple[int, ...]
+    ended: bool
+    decoded: Tuple[Tuple[int, Instruction], ...]
+    # Outputs a native call has produced but not yet handed out
+    pending_outputs: Tuple[int, ...] = ()
+    sparse_pages: SparsePages = ()
+
+
+class Frame(NamedTuple):
+    entry: int
+    caller_base: int
+
+
+def collapse_stacks(stack_counts: Counter[Tuple[int, ...]], names: Optional[Dict[int, str]] = None) -> List[str]:
+    def name(entry: int) -> str:
+        if names is not None and entry in names:
+            return names[entry]
+        return "main" if entry == 0 else f"fn_{entry}"
+    return [f"{';'.join(map(name, stack))} {count}" for stack, count in sorted(stack_counts.items())]
+
+
+class Profile:
+    def __init__(self, call_stacks: bool = False) -> None:
+        self.opcode_counts: Counter[OpCode] = Counter()
+        self.address_counts: Counter[int] = Counter()
+        self.instructions = 0
+        self.run_time = 0.0
+        self.blocked_time = 0.0
+        self.blocked_since: Optional[float] = None
+        self.call_stack: Optional[List[Frame]] = [] if call_stacks else None
+        self.stack_key: Tuple[int, ...] = (0,)
+        self.stack_counts: Counter[Tuple[int, ...]] = Counter()
+        self.jump_target: Optional[int] = None
+
+    def record_call_stack(self, program: "Program", pointer: int, instruction: Instruction, relative_base: int) -> None:
+        assert self.call_stack is not None
+        parts = instruction.parts or (instruction,)
+        first, last = parts[0], parts[-1]
+        # A call jumps to an "arb +N" that opens the callee's frame
+        if pointer == self.jump_target and first.op is OpCode.MOVE_RELATIVE_BASE and program.relative_base > relative_base:
+            self.call_stack.append(Frame(pointer, relative_base))
+            self.stack_key += (pointer,)
+        self.stack_counts[self.stack_key] += len(parts)
+        self.jump_target = None
+        if last.op in JUMPS and program.pointer != pointer + instruction.size:
+            self.jump_target = program.pointer
+            # A return jumps through a relative-mode address after the frame is closed, which also
+            # unwinds frames that were left without a matching return
+            if last.params[1][0] == 2:
+                stack = self.call_stack
+                while stack and stack[-1].caller_base >= program.relative_base:
+                    stack.pop()
+                self.stack_key = (0,) + tuple(frame.entry for frame in stack)
+
+    def function_counts(self) -> Counter[int]:
+        counts: Counter[int] = Counter()
+        for stack, count in self.stack_counts.items():
+            counts[stack[-1]] += count
+        return counts
+
+    def collapsed_stacks(self, names: Optional[Dict[int, str]] = None) -> List[str]:
+        return collapse_stacks(self.stack_counts, names)
+
+    def write_flamegraph(self, path: str, names: Optional[Dict[int, str]] = None) -> None:
+        with open(path, "w") as fout:
+            for line in self.collapsed_stacks(names):
+                fout.write(line + "\n")
+
+    def instructions_per_second(self) -> float:
+        return self.instructions / self.run_time if self.run_time else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "instructions": self.instructions,
+            "run_time": self.run_time,
+            "blocked_time": self.blocked_time,
+            "instructions_per_second": self.instructions_per_second(),
+            "opcodes": {op.name: count for op, count in self.opcode_counts.most_common()},
+            "addresses": {str(address): count for address, count in self.address_counts.most_common()}
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+
+ProgramType = TypeVar("ProgramType", bound="Program")
+
+
 def get_param_mode(param_modes: int, param_num: int) -> int:
     return (param_modes // (10 ** param_num)) % 10
 
 
 class Program(Iterator[int]):
-    def __init__(self, program: List[int], input_data: Optional[List[int]] = None) -> None:
-        self.program = program
-        self.extra_memory: Dict[int, int] = defaultdict(int)
+    def __init__(self, program: ProgramSource, input_data: Optional[List[int]] = None) -> None:
+        if isinstance(program, ProgramImage):
+            # Start out sharing every page of the image; pages are copied on first write
+            self.memory = PagedMemory()
+            self.memory.restore(program.pages)
+        else:
+            self.memory = PagedMemory(program)
         self.pointer = 0
         self.relative_base = 0
         self.input = deque(input_data if input_data is not None else [])
         self.ended = False
+        self.decode_cache: Dict[int, Instruction] = {}
+        self.code_cells: DefaultDict[int, List[int]] = defaultdict(list)
+        self.profile: Optional[Profile] = None
+        self.hooks: List[StepHook] = []
+        self.hashed_memory: Optional[HashedMemory] = None
+        self.pending_outputs: Deque[int] = deque()
 
     def __next__(self) -> int:
         result = self.next_output_or_end()
@@ -37,82 +446,265 @@ class Program(Iterator[int]):
         return result
 
     def __getitem__(self, idx: int) -> int:
-        if idx < len(self.program):
-            return self.program[idx]
-        else:
-            return self.extra_memory[idx]
+        return self.memory[idx]
 
     def __setitem__(self, idx: int, val: int) -> None:
-        if idx < len(self.program):
-            self.program[idx] = val
+        self.memory[idx] = val
+        if idx in self.code_cells:
+            self.invalidate_code(idx)
+
+    def snapshot(self) -> ProgramState:
+        return ProgramState(self.memory.snapshot(), self.pointer, self.relative_base, tuple(self.input), self.ended, tuple(self.decode_cache.items()),
+                            tuple(self.pending_outputs), self.memory.sparse_snapshot())
+
+    def restore(self, state: ProgramState) -> None:
+        self.memory.restore(state.pages, state.sparse_pages)
+        self.pointer = state.pointer
+        self.relative_base = state.relative_base
+        self.input = deque(state.input)
+        self.ended = state.ended
+        self.pending_outputs = deque(state.pending_outputs)
+        self.decode_cache = {}
+        self.code_cells = defaultdict(list)
+        for address, instruction in state.decoded:
+            self.cache_instruction(address, instruction)
+
+    def fork(self: ProgramType) -> ProgramType:
+        clone = copy.copy(self)
+        clone.profile = None
+        clone.hooks = []
+        clone.hashed_memory = None
+        clone.memory = PagedMemory()
+        clone.restore(self.snapshot())
+        clone.chain_hooks()
+        return clone
+
+    def add_hook(self, hook: StepHook) -> None:
+        self.hooks.append(hook)
+        self.chain_hooks()
+
+    def remove_hook(self, hook: StepHook) -> None:
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+        self.chain_hooks()
+
+    def chain_hooks(self) -> None:
+        # Rebuilds next_command with the earliest hook innermost. Watchpoints are checked outermost,
+        # so every other hook has finished with the step before a hit stops the run. The chain ends
+        # in this class's own next_command, so subclasses keep their behaviour while hooked
+        hooks = self.hooks + ([self.watched_step] if isinstance(self.memory, WatchedMemory) else [])
+        if not hooks:
+            self.__dict__.pop("next_command", None)
+            return
+        step: Step = partial(type(self).next_command, self)
+        for hook in hooks:
+            step = partial(hook, step)
+        self.next_command = step  # type: ignore[method-assign]
+
+    def enable_profiling(self, call_stacks: bool = False) -> Profile:
+        self.remove_hook(self.profiled_step)
+        self.profile = Profile(call_stacks)
+        self.add_hook(self.profiled_step)
+        return self.profile
+
+    def disable_profiling(self) -> None:
+        self.profile = None
+        self.remove_hook(self.profiled_step)
+
+    def watch(self, start: int, end: Optional[int] = None, reads: bool = False, writes: bool = True, callback: Optional[Callable[["Program", int, int], Optional[bool]]] = None) -> Watchpoint:
+        watchpoint = Watchpoint(start, start + 1 if end is None else end, reads, writes, callback)
+        if not isinstance(self.memory, WatchedMemory):
+            self.memory = WatchedMemory(self.memory, self)
+            self.chain_hooks()
+        self.memory.add(watchpoint)
+        return watchpoint
+
+    def unwatch(self, watchpoint: Watchpoint) -> None:
+        memory = self.memory
+        if not isinstance(memory, WatchedMemory):
+            raise Exception("No watchpoints are set")
+        memory.remove(watchpoint)
+        if not memory.watchpoints:
+            self.memory = memory.inner
+            self.chain_hooks()
+
+    def enable_state_hashing(self) -> None:
+        if self.hashed_memory is not None:
+            return
+        memory = self.memory
+        if isinstance(memory, WatchedMemory):
+            self.hashed_memory = memory.inner = HashedMemory(memory.inner)
         else:
-            self.extra_memory[idx] = val
+            self.hashed_memory = self.memory = HashedMemory(memory)
+
+    def disable_state_hashing(self) -> None:
+        if self.hashed_memory is None:
+            return
+        memory = self.memory
+        if isinstance(memory, WatchedMemory):
+            memory.inner = self.hashed_memory.inner
+        else:
+            self.memory = self.hashed_memory.inner
+        self.hashed_memory = None
+
+    def state_hash(self) -> int:
+        if self.hashed_memory is None:
+            raise Exception("State hashing is not enabled")
+        return hash((self.hashed_memory.hash, self.pointer, self.relative_base, self.ended, tuple(self.input), tuple(self.pending_outputs)))
+
+    def read_range(self, start: int, end: int) -> List[int]:
+        fetch = self.memory.fetch
+        return [fetch(idx) for idx in range(start, end)]
+
+    def find(self, value: int, start: int = 0, end: Optional[int] = None) -> List[int]:
+        end = len(self.memory) if end is None else end
+        return [start + i for i, cell in enumerate(self.read_range(start, end)) if cell == value]
+
+    def find_sequence(self, values: Sequence[int], start: int = 0) -> Optional[int]:
+        values = list(values)
+        if not values:
+            return start
+        cells = self.read_range(0, len(self.memory))
+        for address in self.find(values[0], start):
+            if cells[address:address + len(values)] == values:
+                return address
+        return None
+
+    def count(self, value: int, start: int = 0, end: Optional[int] = None) -> int:
+        return len(self.find(value, start, end))
 
     def peek(self) -> int:
         return self[self.pointer]
 
-    def next_mem(self) -> int:
-        item = self[self.pointer]
-        self.pointer += 1
-        return item
-
-    def read(self, num: int) -> List[int]:
-        result = []
-        for _ in range(num):
-            result.append(self.next_mem())
-        return result
-
     def jump(self, pointer: int) -> None:
         self.pointer = pointer
 
     def move_relative_base(self, offset: int) -> None:
         self.relative_base += offset
 
-    def get_input_arg_value(self, param_num: int, param_modes: int, idx: int) -> int:
-        param_mode = get_param_mode(param_modes, param_num)
+    def get_input_value(self, param: Parameter) -> int:
+        param_mode, value = param
         if param_mode == 1:
-            return idx
+            return value
         elif param_mode == 2:
-            return self[self.relative_base + idx]
+            return self.memory[self.relative_base + value]
         else:
-            return self[idx]
+            return self.memory[value]
 
-    def get_output_arg_position(self, param_num: int, param_modes: int, idx: int) -> int:
-        param_mode = get_param_mode(param_modes, param_num)
+    def get_output_position(self, param: Parameter) -> int:
+        param_mode, value = param
         if param_mode == 2:
-            return self.relative_base + idx
+            return self.relative_base + value
         else:
-            return idx
-
-    def get_args(self, param_modes: int, input_args: int = 0, output_args: int = 0) -> Tuple[int, ...]:
-        raw_args = self.read(input_args + output_args)
-        result_input_args = [self.get_input_arg_value(i, param_modes, raw_arg) for i, raw_arg in enumerate(raw_args[:input_args])]
-        result_output_args = [self.get_output_arg_position(i + input_args, param_modes, raw_arg) for i, raw_arg in enumerate(raw_args[input_args:])]
-        return tuple(result_input_args + result_output_args)
-
-    def get_input_arg(self, param_modes: int) -> int:
-        return self.get_args(param_modes, 1, 0)[0]
+            return value
 
-    def get_output_arg(self, param_modes: int) -> int:
-        return self.get_args(param_modes, 0, 1)[0]
+    def decode(self, address: int, cache: bool = True) -> Instruction:
+        fetch = self.memory.fetch
+        param_modes, op_val = divmod(fetch(address), 100)
+        op = OpCode(op_val)
+        params = tuple((get_param_mode(param_modes, i), fetch(address + 1 + i)) for i in range(PARAM_COUNTS[op]))
+        instruction = Instruction(op, params, len(params) + 1, op_dispatch[op])
+        if cache:
+            self.cache_instruction(address, instruction)
+        return instruction
+
+    def cache_instruction(self, address: int, instruction: Instruction) -> None:
+        self.decode_cache[address] = instruction
+        for cell in range(address, address + max(instruction.size, instruction.extent)):
+            self.code_cells[cell].append(address)
+
+    def fuse_superinstructions(self) -> int:
+        fused = 0
+        address = 0
+        end = len(self.memory)
+        while address < end:
+            # Only fused pairs are cached; most of the scan covers data that never runs
+            try:
+                first = self.decode(address, False)
+                second = self.decode(address + first.size, False)
+            except ValueError:
+                address += 1
+                continue
+            instruction = fuse_instructions(address, first, second)
+            if instruction is not None and not is_compare_branch(instruction) and self.compare_branch_at(address + first.size):
+                # Leave the second instruction free to pair with the branch after it
+                instruction = None
+            if instruction is None:
+                address += first.size
+            else:
+                self.cache_instruction(address, instruction)
+                fused += 1
+                address += instruction.size
+        return fused
+
+    def compare_branch_at(self, address: int) -> bool:
+        try:
+            first = self.decode(address, False)
+            second = self.decode(address + first.size, False)
+        except ValueError:
+            return False
+        fused = fuse_instructions(address, first, second)
+        return fused is not None and is_compare_branch(fused)
+
+    def invalidate_code(self, idx: int) -> None:
+        for address in self.code_cells.pop(idx):
+            self.decode_cache.pop(address, None)
 
     def next_command(self) -> Tuple[bool, Optional[int]]:
         if self.ended:
             raise Exception("Tried to run after program ended")
+        instruction = self.decode_cache.get(self.pointer)
+        if instruction is None:
+            instruction = self.decode(self.pointer)
         input_data = None
-        item = self.next_mem()
-
-        param_mode, op_val = divmod(item, 100)
-        op = OpCode(op_val)
-        if op == OpCode.END:
-            self.ended = True
-            return (True, None)
-        elif op == OpCode.INPUT:
+        if instruction.op is OpCode.INPUT:
             if len(self.input) == 0:
-                raise Exception("Program asked for input but none was available")
+                raise InputRequired("Program asked for input but none was available")
             input_data = self.input.popleft()
-        output = op_dispatch[op](self, param_mode, input_data)
-        return (False, output)
+        self.pointer += instruction.size
+        output = instruction.handler(self, instruction.params, input_data)
+        return (self.ended, output)
+
+    def profiled_step(self, step: Step) -> Tuple[bool, Optional[int]]:
+        assert self.profile is not None
+        profile = self.profile
+        pointer = self.pointer
+        relative_base = self.relative_base
+        instruction = self.decode_cache.get(pointer)
+        if instruction is None:
+            instruction = self.decode(pointer)
+        start = time.perf_counter()
+        if profile.blocked_since is not None and instruction.op is OpCode.INPUT and len(self.input) > 0:
+            profile.blocked_time += start - profile.blocked_since
+            profile.blocked_since = None
+        elif profile.blocked_since is None and instruction.op is OpCode.INPUT and len(self.input) == 0:
+            # Blocking on the very first instruction, before any step could notice the input was next
+            profile.blocked_since = start
+        result = step()
+        end = time.perf_counter()
+        profile.run_time += end - start
+        for part in instruction.parts or (instruction,):
+            profile.instructions += 1
+            profile.opcode_counts[part.op] += 1
+        profile.address_counts[pointer] += 1
+        if profile.call_stack is not None:
+            profile.record_call_stack(self, pointer, instruction, relative_base)
+        if not self.ended and len(self.input) == 0 and profile.blocked_since is None:
+            next_instruction = self.decode_cache.get(self.pointer)
+            if next_instruction is None:
+                next_instruction = self.decode(self.pointer)
+            if next_instruction.op is OpCode.INPUT:
+                profile.blocked_since = end
+        return result
+
+    def watched_step(self, step: Step) -> Tuple[bool, Optional[int]]:
+        result = step()
+        memory = self.memory
+        if isinstance(memory, WatchedMemory) and memory.hit is not None:
+            watchpoint, address = memory.hit
+            memory.hit = None
+            raise WatchpointHit(watchpoint, address, result[1])
+        return result
 
     def next_output_or_end(self) -> Optional[int]:
         while True:
@@ -130,10 +722,86 @@ class Program(Iterator[int]):
             elif output is not None:
                 yield output
 
-    def consume_all_input(self) -> Iterator[int]:
-        while len(self.input) > 0:
-            yield from self.run_until_input()
-            self.next_command()
+    def run_until_blocked(self, max_outputs: Optional[int] = None) -> Tuple[RunStatus, List[int]]:
+        outputs: List[int] = []
+        if self.ended:
+            return (RunStatus.HALTED, outputs)
+        next_command = self.next_command
+        try:
+            while True:
+                reached_end, output = next_command()
+                if output is not None:
+                    outputs.append(output)
+                    if len(outputs) == max_outputs:
+                        return (RunStatus.OUTPUT, outputs)
+                elif reached_end:
+                    return (RunStatus.HALTED, outputs)
+        except InputRequired:
+            # The input check happens before the pointer moves, so we are still on the INPUT instruction
+            return (RunStatus.NEEDS_INPUT, outputs)
+        except WatchpointHit as hit:
+            if hit.output is not None:
+                outputs.append(hit.output)
+            return (RunStatus.WATCHPOINT, outputs)
+
+    def run_for(self, budget: int) -> Tuple[RunStatus, List[int]]:
+        outputs: List[int] = []
+        if self.ended:
+            return (RunStatus.HALTED, outputs)
+        next_command = self.next_command
+        try:
+            for _ in range(budget):
+                reached_end, output = next_command()
+                if output is not None:
+                    outputs.append(output)
+                elif reached_end:
+                    return (RunStatus.HALTED, outputs)
+        except InputRequired:
+            return (RunStatus.NEEDS_INPUT, outputs)
+        except WatchpointHit as hit:
+            if hit.output is not None:
+                outputs.append(hit.output)
+            return (RunStatus.WATCHPOINT, outputs)
+        return (RunStatus.PREEMPTED, outputs)
+
+    def run_until_loop(self, budget: int) -> Tuple[RunStatus, List[int]]:
+        # Like run_for, but stops with LOOPING once the whole state comes round again: with no new
+        # input the program would then repeat that cycle forever. Brent's algorithm needs one
+        # saved hash and finds the cycle within a few times its length past where it starts.
+        outputs: List[int] = []
+        if self.ended:
+            return (RunStatus.HALTED, outputs)
+        # Hashing slows every write, so only keep it on if the caller had turned it on already
+        enabled = self.hashed_memory is None
+        self.enable_state_hashing()
+        next_command = self.next_command
+        saved = self.state_hash()
+        power = length = 1
+        try:
+            for _ in range(budget):
+                reached_end, output = next_command()
+                if output is not None:
+                    outputs.append(output)
+                elif reached_end:
+                    return (RunStatus.HALTED, outputs)
+                state = self.state_hash()
+                if state == saved:
+                    return (RunStatus.LOOPING, outputs)
+                if length == power:
+                    saved = state
+                    power *= 2
+                    length = 0
+                length += 1
+        except InputRequired:
+            return (RunStatus.NEEDS_INPUT, outputs)
+        except WatchpointHit as hit:
+            if hit.output is not None:
+                outputs.append(hit.output)
+            return (RunStatus.WATCHPOINT, outputs)
+        finally:
+            if enabled:
+                self.disable_state_hashing()
+        return (RunStatus.PREEMPTED, outputs)
 
     def run_to_end(self) -> None:
         while self.next_output_or_end() is not None:
@@ -145,23 +813,50 @@ class Program(Iterator[int]):
             raise Exception("Expected output but reached end of program")
         return result
 
+    def read_outputs(self, num: int) -> List[int]:
+        outputs: List[int] = []
+        next_command = self.next_command
+        while len(outputs) < num:
+            reached_end, output = next_command()
+            if reached_end:
+                raise Exception("Expected output but reached end of program")
+            if output is not None:
+                outputs.append(output)
+        return outputs
+
+    def read_records(self, size: int) -> Iterator[List[int]]:
+        while True:
+            first = self.next_output_or_end()
+            if first is None:
+                return
+            yield [first] + self.read_outputs(size - 1)
+
     def send_input(self, input_data: int) -> None:
         self.input.append(input_data)
 
+    def send_inputs(self, input_data: Iterable[int]) -> None:
+        self.input.extend(input_data)
+
     def write_string(self, input_data: str) -> None:
-        for c in input_data + "\n":
-            self.send_input(ord(c))
+        self.send_inputs(map(ord, input_data + "\n"))
 
-    def read_line(self) -> Optional[str]:
-        line: List[str] = []
+    def read_until(self, terminator: int) -> Optional[List[int]]:
+        values: List[int] = []
+        next_command = self.next_command
         while True:
-            c_val = self.next_output_or_end()
-            if c_val is None:
+            reached_end, output = next_command()
+            if reached_end:
                 return None
-            c = chr(c_val)
-            if c == "\n":
-                return "".join(line)
-            line.append(c)
+            if output is not None:
+                if output == terminator:
+                    return values
+                values.append(output)
+
+    def read_line(self) -> Optional[str]:
+        line = self.read_until(ord("\n"))
+        if line is None:
+            return None
+        return "".join(map(chr, line))
 
     def read_lines(self) -> Iterator[str]:
         while True:
@@ -171,54 +866,137 @@ class Program(Iterator[int]):
             yield s
 
 
-FuncType = Callable[..., Optional[int]]
+def ascii_lines(outputs: Sequence[int]) -> List[str]:
+    # Only complete lines; a trailing partial line is dropped
+    return "".join(map(chr, outputs)).split("\n")[:-1]
+
+
+def make_compare_branch(compare: Callable[[int, int], bool], jump_if: bool) -> Callable[[Program, Tuple[Parameter, ...], Optional[int]], Optional[int]]:
+    def run_compare_branch(program: Program, params: Tuple[Parameter, ...], input_data: Optional[int]) -> None:
+        arg1, arg2, output, dest = params
+        result = compare(program.get_input_value(arg1), program.get_input_value(arg2))
+        program[output[1]] = 1 if result else 0
+        if result == jump_if:
+            program.jump(program.get_input_value(dest))
+    return run_compare_branch
+
 
+def make_fused_pair(address: int, first: Instruction, second: Instruction, guarded: bool) -> Instruction:
+    def run_pair(program: Program, params: Tuple[Parameter, ...], input_data: Optional[int]) -> Optional[int]:
+        first.handler(program, first.params, None)
+        if guarded and program.decode_cache.get(address) is not fused:
+            program.jump(address + first.size)
+            return None
+        return second.handler(program, second.params, None)
+    fused = Instruction(second.op, first.params + second.params, first.size + second.size, run_pair, (first, second))
+    return fused
 
-def run_binary_operator(op: Callable[[int, int], int], program: Program, param_modes: int) -> None:
-    arg1, arg2, output = program.get_args(param_modes, 2, 1)
-    program[output] = op(arg1, arg2)
 
+def fuse_instructions(address: int, first: Instruction, second: Instruction) -> Optional[Instruction]:
+    end = address + first.size + second.size
+    writes = first.op in BINARY_OPS
+    if writes and first.params[2][0] == 0 and address <= first.params[2][1] < end:
+        return None
+    guarded = writes and first.params[2][0] == 2
 
-def run_binary_comparitor(op: Callable[[int, int], bool], program: Program, param_modes: int) -> None:
-    arg1, arg2, output = program.get_args(param_modes, 2, 1)
-    program[output] = 1 if op(arg1, arg2) else 0
+    if first.op in COMPARISONS and second.op in JUMPS and first.params[2][0] == 0 and second.params[0] == first.params[2]:
+        handler = COMPARE_BRANCH_HANDLERS[(first.op, second.op)]
+        return Instruction(second.op, first.params + second.params[1:], end - address, handler, (first, second))
+    if first.op == OpCode.MOVE_RELATIVE_BASE and second.op not in (OpCode.INPUT, OpCode.END):
+        return make_fused_pair(address, first, second, guarded)
+    if first.op == OpCode.ADD and second.op in COMPARISONS and first.params[2][0] != 1 and first.params[2] in second.params[:2]:
+        return make_fused_pair(address, first, second, guarded)
+    return None
 
 
-def run_input_operator(program: Program, input_data: int, param_modes: int) -> None:
-    program[program.get_output_arg(param_modes)] = input_data
+def run_binary_operator(op: Callable[[int, int], int], program: Program, params: Tuple[Parameter, ...]) -> None:
+    arg1, arg2, output = params
+    program[program.get_output_position(output)] = op(program.get_input_value(arg1), program.get_input_value(arg2))
 
 
-def run_output_operator(program: Program, param_modes: int) -> int:
-    return program.get_input_arg(param_modes)
+def run_binary_comparitor(op: Callable[[int, int], bool], program: Program, params: Tuple[Parameter, ...]) -> None:
+    arg1, arg2, output = params
+    program[program.get_output_position(output)] = 1 if op(program.get_input_value(arg1), program.get_input_value(arg2)) else 0
 
 
-def run_jump(eq: bool, program: Program, param_modes: int) -> None:
-    arg, dest = program.get_args(param_modes, input_args=2)
-    if (arg != 0) == eq:
-        program.jump(dest)
+def run_input_operator(program: Program, input_data: Optional[int], params: Tuple[Parameter, ...]) -> None:
+    assert input_data is not None
+    program[program.get_output_position(params[0])] = input_data
 
 
-def move_relative_base(program: Program, param_mode: int) -> None:
-    program.move_relative_base(program.get_input_arg(param_mode))
+def run_output_operator(program: Program, params: Tuple[Parameter, ...]) -> int:
+    return program.get_input_value(params[0])
 
 
-op_dispatch: Dict[OpCode, Callable[[Program, int, int], Optional[int]]] = {
-    OpCode.ADD: lambda program, param_mode, input_data: run_binary_operator(operator.add, program, param_mode),
-    OpCode.MUL: lambda program, param_mode, input_data: run_binary_operator(operator.mul, program, param_mode),
-    OpCode.INPUT: lambda program, param_mode, input_data: run_input_operator(program, input_data, param_mode),
-    OpCode.OUTPUT: lambda program, param_mode, input_data: run_output_operator(program, param_mode),
-    OpCode.JUMP_IF_TRUE: lambda program, param_mode, input_data: run_jump(True, program, param_mode),
-    OpCode.JUMP_IF_FALSE: lambda program, param_mode, input_data: run_jump(False, program, param_mode),
-    OpCode.LESS_THAN: lambda program, param_mode, input_data: run_binary_comparitor(operator.lt, program, param_mode),
-    OpCode.EQUALS: lambda program, param_mode, input_data: run_binary_comparitor(operator.eq, program, param_mode),
-    OpCode.MOVE_RELATIVE_BASE: lambda program, param_mode, input_data: move_relative_base(program, param_mode)
+def run_jump(eq: bool, program: Program, params: Tuple[Parameter, ...]) -> None:
+    arg, dest = params
+    if (program.get_input_value(arg) != 0) == eq:
+        program.jump(program.get_input_value(dest))
+
+
+def move_relative_base(program: Program, params: Tuple[Parameter, ...]) -> None:
+    program.move_relative_base(program.get_input_value(params[0]))
+
+
+def end_program(program: Program) -> None:
+    program.ended = True
+
+
+op_dispatch: Dict[OpCode, Callable[[Program, Tuple[Parameter, ...], Optional[int]], Optional[int]]] = {
+    OpCode.END: lambda program, params, input_data: end_program(program),
+    OpCode.ADD: lambda program, params, input_data: run_binary_operator(operator.add, program, params),
+    OpCode.MUL: lambda program, params, input_data: run_binary_operator(operator.mul, program, params),
+    OpCode.INPUT: lambda program, params, input_data: run_input_operator(program, input_data, params),
+    OpCode.OUTPUT: lambda program, params, input_data: run_output_operator(program, params),
+    OpCode.JUMP_IF_TRUE: lambda program, params, input_data: run_jump(True, program, params),
+    OpCode.JUMP_IF_FALSE: lambda program, params, input_data: run_jump(False, program, params),
+    OpCode.LESS_THAN: lambda program, params, input_data: run_binary_comparitor(operator.lt, program, params),
+    OpCode.EQUALS: lambda program, params, input_data: run_binary_comparitor(operator.eq, program, params),
+    OpCode.MOVE_RELATIVE_BASE: lambda program, params, input_data: move_relative_base(program, params)
 }
 
 
-def run(program_lines: List[int], input_list: Optional[List[int]] = None) -> Optional[int]:
+BINARY_OPS = {OpCode.ADD, OpCode.MUL, OpCode.LESS_THAN, OpCode.EQUALS}
+COMPARISONS = {OpCode.LESS_THAN, OpCode.EQUALS}
+JUMPS = {OpCode.JUMP_IF_TRUE, OpCode.JUMP_IF_FALSE}
+COMPARE_BRANCH_HANDLERS = {
+    (compare_op, jump_op): make_compare_branch(operator.lt if compare_op == OpCode.LESS_THAN else operator.eq, jump_op == OpCode.JUMP_IF_TRUE)
+    for compare_op in COMPARISONS
+    for jump_op in JUMPS
+}
+
+
+def is_compare_branch(instruction: Instruction) -> bool:
+    return instruction.handler in COMPARE_BRANCH_HANDLERS.values()
+
+
+class Specializer(Generic[ProgramType]):
+    def __init__(self, program: ProgramType) -> None:
+        self.program = program
+        self.residuals: Dict[Tuple[int, ...], Tuple[ProgramType, List[int]]] = {}
+
+    def residual(self, prefix: Tuple[int, ...]) -> Tuple[ProgramType, List[int]]:
+        if prefix not in self.residuals:
+            if prefix:
+                parent, outputs = self.residual(prefix[:-1])
+                program = parent.fork()
+                program.input.append(prefix[-1])
+            else:
+                program, outputs = self.program.fork(), []
+            if not program.ended:
+                outputs = outputs + program.run_until_blocked()[1]
+            self.residuals[prefix] = (program, outputs)
+        return self.residuals[prefix]
+
+    def specialize(self, prefix: Sequence[int] = ()) -> Tuple[ProgramType, List[int]]:
+        program, outputs = self.residual(tuple(prefix))
+        return program.fork(), outputs[:]
+
+
+def run(program_lines: Sequence[int], input_list: Optional[List[int]] = None) -> Optional[int]:
     result = run_to_end(program_lines, input_list)
     return result[-1] if result else None
 
 
-def run_to_end(program_lines: List[int], input_list: Optional[List[int]] = None) -> List[int]:
+def run_to_end(program_lines: Sequence[int], input_list: Optional[List[int]] = None) -> List[int]:
     return list(Program(program_lines, input_list))
@@ -0,0 +1,167 @@
+from collections import defaultdict
+from typing import Callable, DefaultDict, Dict, List, Optional, Sequence, Tuple
+
+from intcode_computer import Instruction, OpCode, PAGE_BITS, PAGE_MASK, Parameter, Program, ProgramSource, ProgramState, op_dispatch
+
+HOT_THRESHOLD = 10
+MAX_BLOCK_INSTRUCTIONS = 64
+
+BLOCK_ENDS = {OpCode.JUMP_IF_TRUE, OpCode.JUMP_IF_FALSE, OpCode.OUTPUT}
+NOT_COMPILED = {OpCode.INPUT, OpCode.END}
+BINARY_EXPRESSIONS = {
+    OpCode.ADD: "{} + {}",
+    OpCode.MUL: "{} * {}",
+    OpCode.LESS_THAN: "1 if {} < {} else 0",
+    OpCode.EQUALS: "1 if {} == {} else 0"
+}
+
+Block = Callable[[Program], Optional[int]]
+
+
+def input_expression(param: Parameter, memory_size: int) -> str:
+    param_mode, value = param
+    if param_mode == 1:
+        return str(value)
+    elif param_mode == 2:
+        return f"m[rb + {value}]"
+    elif 0 <= value < memory_size:
+        return f"pages[{value >> PAGE_BITS}][{value & PAGE_MASK}]"
+    else:
+        return f"m[{value}]"
+
+
+def output_expression(param: Parameter) -> str:
+    param_mode, value = param
+    if param_mode == 2:
+        return f"rb + {value}"
+    else:
+        return str(value)
+
+
+def exit_lines(pointer: str, output: str = "None") -> List[str]:
+    return ["p.relative_base = rb", f"p.pointer = {pointer}", f"return {output}"]
+
+
+class JitProgram(Program):
+    def __init__(self, program: ProgramSource, input_data: Optional[List[int]] = None) -> None:
+        super().__init__(program, input_data)
+        self.blocks: Dict[int, Block] = {}
+        self.heat: DefaultDict[int, int] = defaultdict(int)
+        self.at_block_start = True
+        self.compiling = True
+
+    def chain_hooks(self) -> None:
+        super().chain_hooks()
+        # Hooks and watchpoints expect one instruction per step, which a compiled block cannot give
+        # them, so a hooked program runs on the interpreter until its last hook is removed
+        self.compiling = "next_command" not in self.__dict__
+
+    def restore(self, state: ProgramState) -> None:
+        super().restore(state)
+        self.blocks = {}
+        self.heat = defaultdict(int)
+        self.at_block_start = True
+
+    def invalidate_code(self, idx: int) -> None:
+        for address in self.code_cells[idx]:
+            self.blocks.pop(address, None)
+            self.heat.pop(address, None)
+        super().invalidate_code(idx)
+
+    def next_command(self) -> Tuple[bool, Optional[int]]:
+        if self.ended or not self.compiling:
+            return super().next_command()
+        block = self.blocks.get(self.pointer)
+        if block is not None:
+            return (False, block(self))
+        if self.at_block_start:
+            self.heat[self.pointer] += 1
+            if self.heat[self.pointer] == HOT_THRESHOLD:
+                block = self.compile_block(self.pointer)
+                if block is not None:
+                    return (False, block(self))
+        pointer = self.pointer
+        instruction = self.decode_cache.get(pointer)
+        if instruction is None:
+            instruction = self.decode(pointer)
+        reached_end, output = super().next_command()
+        self.at_block_start = instruction.op in BLOCK_ENDS or self.pointer != pointer + instruction.size
+        return (reached_end, output)
+
+    def find_block(self, start: int) -> List[Tuple[int, Instruction]]:
+        instructions: List[Tuple[int, Instruction]] = []
+        address = start
+        while len(instructions) < MAX_BLOCK_INSTRUCTIONS:
+            instruction = self.decode_cache.get(address)
+            if instruction is None:
+                instruction = self.decode(address)
+            if instruction.op in NOT_COMPILED or instruction.extent or not (instruction.parts or instruction.handler is op_dispatch[instruction.op]):
+                # Native calls, loop summaries (whose parts are only the loop's first instruction) and
+                # other custom handlers with no plain parts to compile end the block
+                break
+            for part in instruction.parts or (instruction,):
+                instructions.append((address, part))
+                address += part.size
+            if instruction.op in BLOCK_ENDS:
+                break
+
+        end = address
+        for i, (address, instruction) in enumerate(instructions):
+            if instruction.op in BINARY_EXPRESSIONS:
+                param_mode, target = instruction.params[2]
+                if param_mode == 0 and start <= target < end:
+                    del instructions[i + 1:]
+                    break
+        return instructions
+
+    def compile_block(self, start: int) -> Optional[Block]:
+        instructions = self.find_block(start)
+        if not instructions:
+            return None
+        last_address, last_instruction = instructions[-1]
+        end = last_address + last_instruction.size
+
+        memory_size = len(self.memory)
+
+        def value(param: Parameter) -> str:
+            return input_expression(param, memory_size)
+
+        lines = ["m = p.memory", "pages = m.pages", "rb = p.relative_base"]
+        for address, instruction in instructions:
+            next_address = address + instruction.size
+            op = instruction.op
+            params = instruction.params
+            if op in BINARY_EXPRESSIONS:
+                result = BINARY_EXPRESSIONS[op].format(value(params[0]), value(params[1]))
+                if params[2][0] == 2:
+                    lines.append(f"a = {output_expression(params[2])}")
+                    lines.append(f"p[a] = {result}")
+                    lines.append(f"if {start} <= a < {end}:")
+                    lines.extend("    " + line for line in exit_lines(str(next_address)))
+                else:
+                    lines.append(f"p[{output_expression(params[2])}] = {result}")
+            elif op == OpCode.MOVE_RELATIVE_BASE:
+                lines.append(f"rb += {value(params[0])}")
+            elif op == OpCode.OUTPUT:
+                lines.extend(exit_lines(str(next_address), value(params[0])))
+            elif op in (OpCode.JUMP_IF_TRUE, OpCode.JUMP_IF_FALSE):
+                comparison = "!=" if op == OpCode.JUMP_IF_TRUE else "=="
+                lines.append(f"if {value(params[0])} {comparison} 0:")
+                lines.extend("    " + line for line in exit_lines(value(params[1])))
+                lines.extend(exit_lines(str(next_address)))
+        if last_instruction.op not in BLOCK_ENDS:
+            lines.extend(exit_lines(str(end)))
+
+        source = "def block(p):\n" + "".join(f"    {line}\n" for line in lines)
+        namespace: Dict[str, Block] = {}
+        exec(compile(source, f"<intcode block {start}>", "exec"), namespace)
+        block = namespace["block"]
+
+        self.blocks[start] = block
+        for cell in range(start, end):
+            self.code_cells[cell].append(start)
+        return block
+
+
+def run_compiled(program_lines: Sequence[int], input_list: Optional[List[int]] = None) -> List[int]:
+    return list(JitProgram(program_lines, input_list))
@@ -0,0 +1,78 @@
+import glob
+import hashlib
+import mmap
+import os
+import tempfile
+from array import array
+from typing import List, Sequence
+
+from intcode_computer import ProgramImage
+
+DIGEST_LENGTH = 16
+
+
+def parse_program(source: str) -> List[int]:
+    return list(map(int, source.strip().split(",")))
+
+
+def image_path(path: str, source: bytes) -> str:
+    return f"{path}.{hashlib.sha256(source).hexdigest()[:DIGEST_LENGTH]}.qimg"
+
+
+def write_image(path: str, cached_path: str, program_lines: List[int]) -> bool:
+    try:
+        image = array("q", program_lines)
+    except OverflowError:
+        return False
+    # Only images of this exact source path; input.txt's images must survive a change to input.
+    # Another process may be writing or removing the same images, so each writer gets its own
+    # temporary file and nobody removes the image being written
+    for stale in glob.glob(f"{glob.escape(path)}.{'[0-9a-f]' * DIGEST_LENGTH}.qimg"):
+        if stale != cached_path:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+    directory, name = os.path.split(cached_path)
+    fd, temp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory or None)
+    try:
+        with os.fdopen(fd, "wb") as fout:
+            image.tofile(fout)
+        os.replace(temp_path, cached_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return True
+
+
+def load_program(path: str, use_image: bool = True) -> List[int]:
+    with open(path, "rb") as fin:
+        source = fin.read()
+    if not use_image:
+        return parse_program(source.decode())
+    cached_path = image_path(path, source)
+    if os.path.exists(cached_path):
+        image = array("q")
+        with open(cached_path, "rb") as fin:
+            image.frombytes(fin.read())
+        return image.tolist()
+    program_lines = parse_program(source.decode())
+    write_image(path, cached_path, program_lines)
+    return program_lines
+
+
+def map_program(path: str) -> Sequence[int]:
+    with open(path, "rb") as fin:
+        source = fin.read()
+    cached_path = image_path(path, source)
+    if not os.path.exists(cached_path):
+        program_lines = parse_program(source.decode())
+        if not write_image(path, cached_path, program_lines):
+            return program_lines
+    with open(cached_path, "rb") as fin:
+        return memoryview(mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)).cast("q")
+
+
+def map_image(path: str) -> ProgramImage:
+    # Programs started from this image read straight from the mapped file until they write
+    return ProgramImage(map_program(path))
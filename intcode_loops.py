@@ -0,0 +1,239 @@
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+from intcode_computer import Instruction, OpCode, Program
+from intcode_symbolic import Expression
+
+MIN_ITERATIONS = 2
+
+STRAIGHT_LINE = {OpCode.ADD, OpCode.MUL, OpCode.LESS_THAN, OpCode.EQUALS}
+JUMPS = {OpCode.JUMP_IF_TRUE, OpCode.JUMP_IF_FALSE}
+
+
+class Comparison(NamedTuple):
+    op: OpCode
+    difference: Expression
+
+
+Value = Union[Expression, Comparison]
+
+
+def cell_name(address: int) -> str:
+    return f"v{address}"
+
+
+def evaluate(value: Value, env: Dict[str, int]) -> int:
+    if isinstance(value, Comparison):
+        difference = value.difference.evaluate(env)
+        return int(difference < 0 if value.op == OpCode.LESS_THAN else difference == 0)
+    return value.evaluate(env)
+
+
+def first_exit(kind: str, p: int, q: int) -> Optional[int]:
+    # Smallest i >= 0 at which p + q * i satisfies kind, or None if it never does
+    if kind == "== 0":
+        if q == 0:
+            return 0 if p == 0 else None
+        return -p // q if -p % q == 0 and -p // q >= 0 else None
+    elif kind == "!= 0":
+        if p != 0:
+            return 0
+        return 1 if q != 0 else None
+    elif kind == "< 0":
+        if p < 0:
+            return 0
+        return p // -q + 1 if q < 0 else None
+    else:
+        if p >= 0:
+            return 0
+        return -(p // q) if q > 0 else None
+
+
+class Loop(NamedTuple):
+    start: int
+    end: int
+    cells: Tuple[int, ...]
+    deltas: Dict[int, Expression]
+    accumulators: Dict[int, Expression]
+    temporaries: Dict[int, Value]
+    condition: Value
+    exit_if_true: bool
+
+    def exit_kind(self) -> Tuple[str, Expression]:
+        if isinstance(self.condition, Comparison):
+            if self.condition.op == OpCode.LESS_THAN:
+                return ("< 0" if self.exit_if_true else ">= 0"), self.condition.difference
+            return ("== 0" if self.exit_if_true else "!= 0"), self.condition.difference
+        return ("!= 0" if self.exit_if_true else "== 0"), self.condition
+
+    def iterations(self, program: Program) -> Optional[int]:
+        env = {cell_name(address): program[address] for address in self.cells}
+        kind, expression = self.exit_kind()
+        p = expression.evaluate(env)
+        q = expression.evaluate(self.advance(env, 1)) - p
+        return first_exit(kind, p, q)
+
+    def advance(self, env: Dict[str, int], iterations: int) -> Dict[str, int]:
+        advanced = dict(env)
+        once = dict(env)
+        for address, delta in self.deltas.items():
+            step = delta.evaluate(env)
+            advanced[cell_name(address)] += iterations * step
+            once[cell_name(address)] += step
+        # An accumulator's step grows by the same amount every iteration, so its total is an arithmetic series
+        for address, delta in self.accumulators.items():
+            step = delta.evaluate(env)
+            growth = delta.evaluate(once) - step
+            advanced[cell_name(address)] += iterations * step + growth * (iterations * (iterations - 1) // 2)
+        return advanced
+
+    def skip(self, program: Program, iterations: int) -> None:
+        env = {cell_name(address): program[address] for address in self.cells}
+        # Temporaries are written before they are read, so only their value from the last skipped iteration matters
+        last = self.advance(env, iterations - 1)
+        values = {address: evaluate(value, last) for address, value in self.temporaries.items()}
+        final = self.advance(env, iterations)
+        values.update((address, final[cell_name(address)]) for address in (*self.deltas, *self.accumulators))
+        for address, value in values.items():
+            program[address] = value
+
+
+def decode_loop(program: Program, start: int, end: int) -> Optional[List[Tuple[int, Instruction]]]:
+    instructions = []
+    address = start
+    while address < end:
+        try:
+            instruction = program.decode(address, cache=False)
+        except ValueError:
+            return None
+        instructions.append((address, instruction))
+        address += instruction.size
+    return instructions if address == end else None
+
+
+def is_linear_in(expression: Expression, names: Set[str]) -> bool:
+    for monomial in expression.terms:
+        carried = [(name, power) for name, power in monomial if name in names]
+        if len(carried) > 1 or (carried and carried[0][1] != 1):
+            return False
+    return True
+
+
+def analyze_loop(program: Program, start: int, jump_address: int) -> Optional[Loop]:
+    back_jump = program.decode(jump_address, cache=False)
+    end = jump_address + back_jump.size
+    instructions = decode_loop(program, start, end)
+    if instructions is None:
+        return None
+
+    state: Dict[int, Value] = {}
+    first_access: Dict[int, str] = {}
+    exit_condition: Optional[Value] = None
+    exit_if_true = False
+
+    def read(param: Tuple[int, int]) -> Optional[Value]:
+        param_mode, value = param
+        if param_mode == 1:
+            return Expression.constant(value)
+        if param_mode != 0:
+            return None
+        first_access.setdefault(value, "read")
+        return state.get(value, Expression.variable(cell_name(value)))
+
+    for address, instruction in instructions:
+        op = instruction.op
+        params = instruction.params
+        if op in JUMPS:
+            condition = read(params[0])
+            target_mode, target = params[1]
+            if condition is None or target_mode != 1:
+                return None
+            if address != jump_address and exit_condition is None and not start <= target < end:
+                # An exit ahead of the back edge, e.g. a compare and branch at the top; the back edge
+                # must then always be taken, and the instructions before the exit run once more on the
+                # way out, which the interpreter does after the skipped iterations
+                exit_condition, exit_if_true = condition, op == OpCode.JUMP_IF_TRUE
+            elif address == jump_address and target == start:
+                if exit_condition is None:
+                    exit_condition, exit_if_true = condition, op == OpCode.JUMP_IF_FALSE
+                elif isinstance(condition, Comparison) or condition.constant_value() is None or (condition.constant_value() != 0) != (op == OpCode.JUMP_IF_TRUE):
+                    return None
+            else:
+                return None
+        elif op in STRAIGHT_LINE:
+            a, b = read(params[0]), read(params[1])
+            target_mode, target = params[2]
+            if not isinstance(a, Expression) or not isinstance(b, Expression) or target_mode != 0 or start <= target < end:
+                return None
+            first_access.setdefault(target, "write")
+            if op == OpCode.ADD:
+                state[target] = a + b
+            elif op == OpCode.MUL:
+                state[target] = a * b
+            else:
+                state[target] = Comparison(op, a - b)
+        else:
+            return None
+    if exit_condition is None:
+        return None
+
+    temporaries = {address: value for address, value in state.items() if first_access[address] == "write"}
+    carried_deltas: Dict[int, Expression] = {}
+    for address, value in state.items():
+        if address not in temporaries:
+            if not isinstance(value, Expression):
+                return None
+            carried_deltas[address] = value - Expression.variable(cell_name(address))
+    carried = {cell_name(address) for address in carried_deltas}
+
+    deltas = {address: delta for address, delta in carried_deltas.items() if not delta.variables() & carried}
+    counters = {cell_name(address) for address in deltas}
+    accumulators = {address: delta for address, delta in carried_deltas.items() if address not in deltas}
+    for delta in accumulators.values():
+        if not delta.variables() & carried <= counters or not is_linear_in(delta, carried):
+            return None
+
+    condition = exit_condition.difference if isinstance(exit_condition, Comparison) else exit_condition
+    if not condition.variables() & carried <= counters or not is_linear_in(condition, carried):
+        return None
+    cells = tuple(sorted(set(first_access) | set(state)))
+    return Loop(start, end, cells, deltas, accumulators, temporaries, exit_condition, exit_if_true)
+
+
+def make_loop_summary(loop: Loop, original: Instruction) -> Instruction:
+    def run_summary(program: Program, params: Tuple[Tuple[int, int], ...], input_data: Optional[int]) -> Optional[int]:
+        iterations = loop.iterations(program)
+        if iterations is not None and iterations >= MIN_ITERATIONS:
+            loop.skip(program, iterations)
+        return original.handler(program, original.params, input_data)
+    # The summary stands for the whole loop, so a write anywhere in its code must drop it
+    return Instruction(original.op, original.params, original.size, run_summary, original.parts or (original,), loop.end - loop.start)
+
+
+def find_loops(program: Program) -> List[Loop]:
+    loops = []
+    address = 0
+    end = len(program.memory)
+    while address < end:
+        try:
+            instruction = program.decode(address, cache=False)
+        except ValueError:
+            address += 1
+            continue
+        if instruction.op in JUMPS:
+            target_mode, target = instruction.params[1]
+            if target_mode == 1 and 0 <= target <= address:
+                loop = analyze_loop(program, target, address)
+                if loop is not None:
+                    loops.append(loop)
+        address += instruction.size
+    return loops
+
+
+def summarize_loops(program: Program) -> int:
+    loops = find_loops(program)
+    for loop in loops:
+        original = program.decode_cache.get(loop.start)
+        if original is None or original.size > loop.end - loop.start:
+            original = program.decode(loop.start)
+        program.cache_instruction(loop.start, make_loop_summary(loop, original))
+    return len(loops)
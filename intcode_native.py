@@ -0,0 +1,134 @@
+import hashlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from intcode_computer import Instruction, OpCode, Parameter, Program
+
+MAX_SUBROUTINE_SIZE = 1024
+
+# Gets the frame the routine opened and returns its outputs. It must also make the same memory
+# writes as the Intcode routine, since the program may read them afterwards
+NativeRoutine = Callable[[Program, int], List[int]]
+
+NATIVE_ROUTINES: Dict[str, NativeRoutine] = {}
+
+
+class Subroutine(NamedTuple):
+    entry: int
+    end: int
+    frame_size: int
+    return_slot: int
+    fingerprint: str
+
+
+def register_native(fingerprint: str, routine: NativeRoutine) -> None:
+    NATIVE_ROUTINES[fingerprint] = routine
+
+
+def zero_terminated_printer(pointer_offset: int, char_offset: Optional[int] = None) -> NativeRoutine:
+    # For printers that walk the pointer in its frame slot up to the terminator, loading each
+    # character into the char_offset slot on the way
+    def print_string(program: Program, frame: int) -> List[int]:
+        address = program[frame + pointer_offset]
+        outputs = []
+        while program[address] != 0:
+            outputs.append(program[address])
+            address += 1
+        program[frame + pointer_offset] = address
+        if char_offset is not None:
+            program[frame + char_offset] = 0
+        return outputs
+    return print_string
+
+
+def is_unconditional(instruction: Instruction) -> bool:
+    (condition_mode, condition), _ = instruction.params
+    if condition_mode != 1:
+        return False
+    return (condition != 0) == (instruction.op == OpCode.JUMP_IF_TRUE)
+
+
+def fingerprint(instructions: List[Tuple[int, Instruction]], entry: int, end: int) -> str:
+    # Addresses inside the routine are hashed relative to its entry so a moved copy still matches
+    digest = hashlib.sha256()
+    for address, instruction in instructions:
+        words = [instruction.op.value] + [mode for mode, value in instruction.params]
+        for mode, value in instruction.params:
+            words.append(value - entry if mode != 2 and entry <= value < end else value)
+        digest.update(repr(words).encode())
+    return digest.hexdigest()
+
+
+def analyze_subroutine(program: Program, entry: int) -> Optional[Subroutine]:
+    try:
+        first = program.decode(entry, cache=False)
+    except ValueError:
+        return None
+    if first.op != OpCode.MOVE_RELATIVE_BASE or first.params[0][0] != 1 or first.params[0][1] <= 0:
+        return None
+    frame_size = first.params[0][1]
+
+    instructions: List[Tuple[int, Instruction]] = []
+    previous: Optional[Instruction] = None
+    address = entry
+    while address < entry + MAX_SUBROUTINE_SIZE:
+        try:
+            instruction = program.decode(address, cache=False)
+        except ValueError:
+            return None
+        instructions.append((address, instruction))
+        address += instruction.size
+        if instruction.op in (OpCode.JUMP_IF_TRUE, OpCode.JUMP_IF_FALSE) and is_unconditional(instruction):
+            target: Parameter = instruction.params[1]
+            if previous is not None and previous.op == OpCode.MOVE_RELATIVE_BASE and previous.params[0] == (1, -frame_size) and target[0] == 2:
+                return Subroutine(entry, address, frame_size, target[1], fingerprint(instructions, entry, address))
+        previous = instruction
+    return None
+
+
+def find_subroutines(program: Program) -> List[Subroutine]:
+    entries = set()
+    address = 0
+    end = len(program.memory)
+    while address < end:
+        try:
+            instruction = program.decode(address, cache=False)
+        except ValueError:
+            address += 1
+            continue
+        if instruction.op in (OpCode.JUMP_IF_TRUE, OpCode.JUMP_IF_FALSE) and is_unconditional(instruction):
+            target_mode, target = instruction.params[1]
+            if target_mode == 1:
+                entries.add(target)
+        address += instruction.size
+    subroutines = (analyze_subroutine(program, entry) for entry in sorted(entries))
+    return [subroutine for subroutine in subroutines if subroutine is not None]
+
+
+def make_native_call(subroutine: Subroutine, routine: NativeRoutine) -> Instruction:
+    def run_native(program: Program, params: Tuple[Parameter, ...], input_data: Optional[int]) -> Optional[int]:
+        pending = program.pending_outputs
+        if not pending:
+            pending.extend(routine(program, program.relative_base + subroutine.frame_size))
+            # A routine that patches its own code, as self-modifying Intcode often does, drops the
+            # native call along with the patched instruction; the call still stands for the routine
+            if program.decode_cache.get(subroutine.entry) is not native_call:
+                program.cache_instruction(subroutine.entry, native_call)
+        # Stay on the entry point until every output has been handed out one step at a time
+        if len(pending) > 1:
+            program.jump(subroutine.entry)
+        else:
+            program.jump(program[program.relative_base + subroutine.return_slot])
+        return pending.popleft() if pending else None
+    native_call = Instruction(OpCode.MOVE_RELATIVE_BASE, ((1, subroutine.frame_size),), subroutine.end - subroutine.entry, run_native)
+    return native_call
+
+
+def install_native_routines(program: Program, routines: Optional[Dict[str, NativeRoutine]] = None) -> int:
+    routines = NATIVE_ROUTINES if routines is None else routines
+    installed = 0
+    for subroutine in find_subroutines(program):
+        routine = routines.get(subroutine.fingerprint)
+        if routine is not None:
+            program.cache_instruction(subroutine.entry, make_native_call(subroutine, routine))
+            installed += 1
+    return installed
@@ -0,0 +1,32 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+from intcode_computer import Program
+from intcode_loader import map_image, map_program
+
+
+worker_program: Optional[Program] = None
+
+
+def init_sweep_worker(program: Union[str, Sequence[int]]) -> None:
+    global worker_program
+    worker_program = Program(map_image(program) if isinstance(program, str) else program)
+
+
+def run_in_sweep_worker(input_list: Sequence[int]) -> List[int]:
+    assert worker_program is not None
+    program = worker_program.fork()
+    program.input.extend(input_list)
+    return list(program)
+
+
+def run_many(program: Union[str, Sequence[int]], input_lists: Iterable[Sequence[int]], max_workers: Optional[int] = None, chunksize: int = 64) -> List[List[int]]:
+    # Given the path of a program file each worker maps its image instead of being sent a copy
+    if isinstance(program, str):
+        # Writes a missing image once up front so the workers only ever map it
+        map_program(program)
+        initargs: Tuple[Union[str, List[int]]] = (program,)
+    else:
+        initargs = (list(program),)
+    with ProcessPoolExecutor(max_workers, initializer=init_sweep_worker, initargs=initargs) as executor:
+        return list(executor.map(run_in_sweep_worker, input_lists, chunksize=chunksize))
@@ -0,0 +1,75 @@
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from intcode_computer import Program, RunStatus
+
+OutputHandler = Callable[[int, List[int]], None]
+
+
+class Scheduler:
+    def __init__(self, output_handler: OutputHandler, quantum: int = 1000, idle_input: Optional[int] = None, max_idle_polls: int = 1000) -> None:
+        self.output_handler = output_handler
+        self.quantum = quantum
+        self.idle_input = idle_input
+        self.max_idle_polls = max_idle_polls
+        self.programs: List[Program] = []
+        self.runnable: Deque[int] = deque()
+        self.queued: Set[int] = set()
+        self.blocked: Set[int] = set()
+        self.halted: Set[int] = set()
+        self.idle_states: Dict[int, Tuple[int, int]] = {}
+
+    def add(self, program: Program) -> int:
+        node = len(self.programs)
+        self.programs.append(program)
+        if self.idle_input is not None:
+            program.enable_state_hashing()
+        self.wake(node)
+        return node
+
+    def wake(self, node: int) -> None:
+        if node in self.queued or node in self.halted:
+            return
+        self.blocked.discard(node)
+        self.queued.add(node)
+        self.runnable.append(node)
+
+    def send(self, node: int, values: List[int]) -> None:
+        self.programs[node].send_inputs(values)
+        self.idle_states.pop(node, None)
+        self.wake(node)
+
+    def step(self) -> bool:
+        if not self.runnable:
+            return False
+        node = self.runnable.popleft()
+        self.queued.discard(node)
+        program = self.programs[node]
+
+        status, outputs = program.run_for(self.quantum)
+        if outputs:
+            self.idle_states.pop(node, None)
+            self.output_handler(node, outputs)
+
+        if status is RunStatus.HALTED:
+            self.halted.add(node)
+        elif status is not RunStatus.NEEDS_INPUT or len(program.input) > 0:
+            self.wake(node)
+        elif self.idle_input is not None:
+            # A node is only idle once answering a poll brings it back to the exact state it
+            # was polled in; until then it may still be counting down to its next send
+            state = program.state_hash()
+            last_state, polls = self.idle_states.get(node, (None, 0))
+            if state == last_state or polls >= self.max_idle_polls:
+                self.blocked.add(node)
+            else:
+                self.idle_states[node] = (state, polls + 1)
+                program.send_input(self.idle_input)
+                self.wake(node)
+        else:
+            self.blocked.add(node)
+        return True
+
+    def run_until_idle(self) -> None:
+        while self.step():
+            pass
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import itertools
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+from intcode_computer import OpCode, PARAM_COUNTS, get_param_mode
+
+Monomial = Tuple[Tuple[str, int], ...]
+
+MAX_STEPS = 1_000_000
+
+
+class SymbolicError(Exception):
+    pass
+
+
+class Expression:
+    def __init__(self, terms: Mapping[Monomial, int]) -> None:
+        self.terms = {monomial: coefficient for monomial, coefficient in terms.items() if coefficient != 0}
+
+    @staticmethod
+    def constant(value: int) -> Expression:
+        return Expression({(): value})
+
+    @staticmethod
+    def variable(name: str) -> Expression:
+        return Expression({((name, 1),): 1})
+
+    def __add__(self, other: Expression) -> Expression:
+        terms = dict(self.terms)
+        for monomial, coefficient in other.terms.items():
+            terms[monomial] = terms.get(monomial, 0) + coefficient
+        return Expression(terms)
+
+    def __neg__(self) -> Expression:
+        return Expression({monomial: -coefficient for monomial, coefficient in self.terms.items()})
+
+    def __sub__(self, other: Expression) -> Expression:
+        return self + -other
+
+    def __mul__(self, other: Expression) -> Expression:
+        terms: Dict[Monomial, int] = {}
+        for (left, a), (right, b) in itertools.product(self.terms.items(), other.terms.items()):
+            powers = dict(left)
+            for name, power in right:
+                powers[name] = powers.get(name, 0) + power
+            monomial = tuple(sorted(powers.items()))
+            terms[monomial] = terms.get(monomial, 0) + a * b
+        return Expression(terms)
+
+    def constant_value(self) -> Optional[int]:
+        if not self.terms:
+            return 0
+        if len(self.terms) == 1 and () in self.terms:
+            return self.terms[()]
+        return None
+
+    def variables(self) -> Set[str]:
+        return {name for monomial in self.terms for name, power in monomial}
+
+    def degree(self, name: str) -> int:
+        return max((power for monomial in self.terms for var, power in monomial if var == name), default=0)
+
+    def substitute(self, assignment: Mapping[str, int]) -> Expression:
+        result = Expression({})
+        for monomial, coefficient in self.terms.items():
+            value = coefficient
+            remaining = []
+            for name, power in monomial:
+                if name in assignment:
+                    value *= assignment[name] ** power
+                else:
+                    remaining.append((name, power))
+            result += Expression({tuple(remaining): value})
+        return result
+
+    def evaluate(self, assignment: Mapping[str, int]) -> int:
+        missing = self.variables() - assignment.keys()
+        if missing:
+            raise SymbolicError(f"No concrete value for {', '.join(sorted(missing))} in {self}")
+        value = self.substitute(assignment).constant_value()
+        assert value is not None
+        return value
+
+    def __str__(self) -> str:
+        if not self.terms:
+            return "0"
+        parts = []
+        for monomial, coefficient in sorted(self.terms.items(), key=lambda item: (-len(item[0]), item[0])):
+            factors = [name if power == 1 else f"{name}^{power}" for name, power in monomial]
+            if coefficient == -1 and factors:
+                factors[0] = "-" + factors[0]
+            elif coefficient != 1 or not factors:
+                factors.insert(0, str(coefficient))
+            parts.append("*".join(factors))
+        return " + ".join(parts).replace("+ -", "- ")
+
+
+class Condition(NamedTuple):
+    expression: Expression
+    relation: str
+    value: int
+
+    def holds(self, assignment: Mapping[str, int]) -> bool:
+        value = self.expression.evaluate(assignment)
+        if self.relation == "<":
+            return value < self.value
+        elif self.relation == ">=":
+            return value >= self.value
+        elif self.relation == "!=":
+            return value != self.value
+        return value == self.value
+
+    def __str__(self) -> str:
+        return f"{self.expression} {self.relation} {self.value}"
+
+
+class SymbolicProgram:
+    def __init__(self, program: Sequence[int], symbols: Optional[Mapping[int, str]] = None,
+                 input_data: Optional[Sequence[Union[int, str]]] = None, assignment: Optional[Mapping[str, int]] = None) -> None:
+        self.program = program
+        self.memory: Dict[int, Expression] = {address: Expression.variable(name) for address, name in (symbols or {}).items()}
+        self.input = list(input_data or [])
+        self.assignment = dict(assignment or {})
+        self.pointer = 0
+        self.relative_base = 0
+        self.ended = False
+        self.outputs: List[Expression] = []
+        self.conditions: List[Condition] = []
+
+    def __getitem__(self, idx: int) -> Expression:
+        if idx in self.memory:
+            return self.memory[idx]
+        return Expression.constant(self.program[idx] if 0 <= idx < len(self.program) else 0)
+
+    def __setitem__(self, idx: int, val: Expression) -> None:
+        if idx < 0:
+            raise SymbolicError(f"Tried to write to negative address {idx}")
+        self.memory[idx] = val
+
+    def value(self, address: int) -> Expression:
+        expression = self[address]
+        opaque = [name for name in expression.variables() if name.startswith("[")]
+        if opaque:
+            raise SymbolicError(f"Cell {address} depends on memory read through a symbolic address: {', '.join(opaque)}")
+        for condition in self.conditions:
+            if any(name.startswith("[") for name in condition.expression.variables()):
+                raise SymbolicError(f"Execution depended on memory read through a symbolic address: {condition}")
+        return expression
+
+    def concrete(self, expression: Expression, what: str) -> int:
+        value = expression.constant_value()
+        if value is not None:
+            return value
+        # Data-dependent control flow: follow the path the concrete values take and remember why
+        if not self.assignment:
+            raise SymbolicError(f"The {what} at {self.pointer} depends on {expression}; give concrete values to follow one path")
+        value = expression.evaluate(self.assignment)
+        self.conditions.append(Condition(expression, "==", value))
+        return value
+
+    def read(self, param_mode: int, raw: Expression) -> Expression:
+        if param_mode == 1:
+            return raw
+        offset = self.relative_base if param_mode == 2 else 0
+        address = raw.constant_value()
+        if address is None:
+            # Reading through a symbolic address gives an opaque value that only matters if it is used
+            return Expression.variable(f"[{Expression.constant(offset) + raw}]")
+        return self[offset + address]
+
+    def write_address(self, param_mode: int, raw: Expression) -> int:
+        offset = self.relative_base if param_mode == 2 else 0
+        return offset + self.concrete(raw, "write address")
+
+    def compare(self, op: OpCode, a: Expression, b: Expression) -> Expression:
+        difference = a - b
+        value = difference.constant_value()
+        if value is None:
+            if not self.assignment:
+                raise SymbolicError(f"The comparison at {self.pointer} depends on {difference}; give concrete values to follow one path")
+            value = difference.evaluate(self.assignment)
+            if op == OpCode.LESS_THAN:
+                self.conditions.append(Condition(difference, "<" if value < 0 else ">=", 0))
+            else:
+                self.conditions.append(Condition(difference, "==" if value == 0 else "!=", 0))
+        result = value < 0 if op == OpCode.LESS_THAN else value == 0
+        return Expression.constant(1 if result else 0)
+
+    def step(self) -> None:
+        param_modes, op_val = divmod(self.concrete(self[self.pointer], "opcode"), 100)
+        try:
+            op = OpCode(op_val)
+        except ValueError:
+            raise SymbolicError(f"Unknown opcode {op_val} at {self.pointer}")
+        modes = [get_param_mode(param_modes, i) for i in range(PARAM_COUNTS[op])]
+        raw = [self[self.pointer + 1 + i] for i in range(len(modes))]
+        next_pointer = self.pointer + len(modes) + 1
+
+        if op in (OpCode.ADD, OpCode.MUL, OpCode.LESS_THAN, OpCode.EQUALS):
+            a, b = self.read(modes[0], raw[0]), self.read(modes[1], raw[1])
+            if op == OpCode.ADD:
+                result = a + b
+            elif op == OpCode.MUL:
+                result = a * b
+            else:
+                result = self.compare(op, a, b)
+            self[self.write_address(modes[2], raw[2])] = result
+        elif op == OpCode.INPUT:
+            if not self.input:
+                raise SymbolicError("Program asked for input but none was available")
+            symbol = self.input.pop(0)
+            self[self.write_address(modes[0], raw[0])] = Expression.variable(symbol) if isinstance(symbol, str) else Expression.constant(symbol)
+        elif op == OpCode.OUTPUT:
+            self.outputs.append(self.read(modes[0], raw[0]))
+        elif op in (OpCode.JUMP_IF_TRUE, OpCode.JUMP_IF_FALSE):
+            condition = self.read(modes[0], raw[0])
+            value = condition.constant_value()
+            if value is None:
+                if not self.assignment:
+                    raise SymbolicError(f"The branch at {self.pointer} depends on {condition}; give concrete values to follow one path")
+                value = condition.evaluate(self.assignment)
+                self.conditions.append(Condition(condition, "==" if value == 0 else "!=", 0))
+            if (value != 0) == (op == OpCode.JUMP_IF_TRUE):
+                next_pointer = self.concrete(self.read(modes[1], raw[1]), "jump target")
+        elif op == OpCode.MOVE_RELATIVE_BASE:
+            self.relative_base += self.concrete(self.read(modes[0], raw[0]), "relative base offset")
+        elif op == OpCode.END:
+            self.ended = True
+        self.pointer = next_pointer
+
+    def run(self, max_steps: int = MAX_STEPS) -> List[Expression]:
+        for _ in range(max_steps):
+            if self.ended:
+                return self.outputs
+            self.step()
+        raise SymbolicError(f"Program did not halt within {max_steps} steps")
+
+
+def solve(expression: Expression, target: int, domains: Mapping[str, range],
+          conditions: Sequence[Condition] = ()) -> Iterator[Dict[str, int]]:
+    # The expression only describes the path the program took under its concrete assignment, so
+    # a solution must also satisfy every condition recorded along that path
+    names = sorted(expression.variables().union(*(condition.expression.variables() for condition in conditions)))
+    if not names:
+        if expression.constant_value() == target and all(condition.holds({}) for condition in conditions):
+            yield {}
+        return
+    *outer, last = names
+    for values in itertools.product(*(domains[name] for name in outer)):
+        assignment = dict(zip(outer, values))
+        remaining = expression.substitute(assignment) - Expression.constant(target)
+        if remaining.degree(last) <= 1:
+            # remaining is slope * last + offset, so the root can be read off directly
+            slope = remaining.terms.get(((last, 1),), 0)
+            offset = remaining.terms.get((), 0)
+            if slope == 0:
+                candidates = domains[last] if offset == 0 else range(0)
+            elif -offset % slope == 0:
+                candidates = range(-offset // slope, -offset // slope + 1)
+            else:
+                candidates = range(0)
+        else:
+            candidates = domains[last]
+        for value in candidates:
+            if value in domains[last] and remaining.substitute({last: value}).constant_value() == 0:
+                solution = {**assignment, last: value}
+                if all(condition.holds(solution) for condition in conditions):
+                    yield solution
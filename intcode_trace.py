@@ -0,0 +1,260 @@
+from bisect import bisect_right
+from typing import BinaryIO, Iterable, List, NamedTuple, Optional, Tuple
+
+from intcode_computer import Page, Program, ProgramState, ProgramType, SparsePages, Step, ZERO_PAGE, make_page
+
+TRACE_MAGIC = b"ICTR\x03"
+TRACE_INPUT = 1
+TRACE_OUTPUT = 2
+TRACE_CHECKPOINT = 3
+
+
+def zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def unzigzag(value: int) -> int:
+    return -((value + 1) >> 1) if value & 1 else value >> 1
+
+
+def write_varint(buffer: bytearray, value: int) -> None:
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def write_pages(record: bytearray, pages: Tuple[Page, ...], base: Tuple[Page, ...]) -> None:
+    # Only pages that are not the same object as in base are written, so base must be an
+    # earlier snapshot of the same memory
+    changed = [i for i, page in enumerate(pages) if i >= len(base) or page is not base[i]]
+    write_varint(record, len(pages))
+    write_varint(record, len(changed))
+    last_index = 0
+    for index in changed:
+        write_varint(record, index - last_index)
+        last_index = index
+        write_page(record, pages[index])
+
+
+def read_pages(data: bytes, pos: int, pages: List[Page]) -> int:
+    page_count, pos = read_varint(data, pos)
+    changed, pos = read_varint(data, pos)
+    del pages[page_count:]
+    pages.extend([ZERO_PAGE] * (page_count - len(pages)))
+    index = 0
+    for _ in range(changed):
+        index_delta, pos = read_varint(data, pos)
+        index += index_delta
+        pages[index], pos = read_page(data, pos)
+    return pos
+
+
+def write_page(record: bytearray, page: Page) -> None:
+    length = len(page)
+    while length > 0 and page[length - 1] == 0:
+        length -= 1
+    write_varint(record, length)
+    previous = 0
+    for value in page[:length]:
+        write_varint(record, zigzag(value - previous))
+        previous = value
+
+
+def read_page(data: bytes, pos: int) -> Tuple[Page, int]:
+    length, pos = read_varint(data, pos)
+    values = []
+    previous = 0
+    for _ in range(length):
+        delta, pos = read_varint(data, pos)
+        previous += unzigzag(delta)
+        values.append(previous)
+    return make_page(values) if values else ZERO_PAGE, pos
+
+
+def write_sparse_pages(record: bytearray, sparse: SparsePages) -> None:
+    # Pages past the dense page list are rare, so they are written in full every time
+    write_varint(record, len(sparse))
+    last_page_num = 0
+    for page_num, page in sparse:
+        write_varint(record, page_num - last_page_num)
+        last_page_num = page_num
+        write_page(record, page)
+
+
+def read_sparse_pages(data: bytes, pos: int) -> Tuple[SparsePages, int]:
+    count, pos = read_varint(data, pos)
+    sparse = []
+    page_num = 0
+    for _ in range(count):
+        page_num_delta, pos = read_varint(data, pos)
+        page_num += page_num_delta
+        page, pos = read_page(data, pos)
+        sparse.append((page_num, page))
+    return tuple(sparse), pos
+
+
+def write_values(record: bytearray, values: Iterable[int]) -> None:
+    values = list(values)
+    write_varint(record, len(values))
+    for value in values:
+        write_varint(record, zigzag(value))
+
+
+def read_values(data: bytes, pos: int) -> Tuple[List[int], int]:
+    count, pos = read_varint(data, pos)
+    values = []
+    for _ in range(count):
+        value, pos = read_varint(data, pos)
+        values.append(unzigzag(value))
+    return values, pos
+
+
+class Trace:
+    def __init__(self, program: Program, stream: BinaryIO, checkpoint_interval: Optional[int] = None) -> None:
+        self.program = program
+        self.stream = stream
+        self.checkpoint_interval = checkpoint_interval
+        self.steps = 0
+        self.next_checkpoint = -1
+        self.last_event = 0
+        self.last_input = 0
+        self.last_output = 0
+        self.pages: Tuple[Page, ...] = ()
+        stream.write(TRACE_MAGIC)
+
+    def start_record(self, tag: int) -> bytearray:
+        record = bytearray([tag])
+        write_varint(record, self.steps - self.last_event)
+        self.last_event = self.steps
+        return record
+
+    def record_input(self, value: int) -> None:
+        record = self.start_record(TRACE_INPUT)
+        write_varint(record, zigzag(value - self.last_input))
+        self.last_input = value
+        self.stream.write(record)
+
+    def record_output(self, value: int) -> None:
+        record = self.start_record(TRACE_OUTPUT)
+        write_varint(record, zigzag(value - self.last_output))
+        self.last_output = value
+        self.stream.write(record)
+
+    def checkpoint(self) -> None:
+        # Snapshotting makes the next write to each page copy it, so a page that is still the
+        # same object as at the previous checkpoint has not changed since
+        program = self.program
+        pages = program.memory.snapshot()
+        record = self.start_record(TRACE_CHECKPOINT)
+        write_varint(record, zigzag(program.pointer))
+        write_varint(record, zigzag(program.relative_base))
+        write_varint(record, 1 if program.ended else 0)
+        write_pages(record, pages, self.pages)
+        write_sparse_pages(record, program.memory.sparse_snapshot())
+        write_values(record, program.pending_outputs)
+        self.stream.write(record)
+        self.pages = pages
+        if self.checkpoint_interval is not None:
+            self.next_checkpoint = self.steps + self.checkpoint_interval
+
+    def step(self, step: Step) -> Tuple[bool, Optional[int]]:
+        program = self.program
+        if self.steps == self.next_checkpoint:
+            self.checkpoint()
+        pending = len(program.input)
+        next_input = program.input[0] if pending else 0
+        result = step()
+        self.steps += 1
+        if len(program.input) < pending:
+            self.record_input(next_input)
+        if result[1] is not None:
+            self.record_output(result[1])
+        return result
+
+    def stop(self) -> None:
+        self.program.remove_hook(self.step)
+        self.stream.flush()
+
+
+def enable_tracing(program: Program, stream: BinaryIO, checkpoint_interval: Optional[int] = None) -> Trace:
+    trace = Trace(program, stream, checkpoint_interval)
+    trace.checkpoint()
+    program.add_hook(trace.step)
+    return trace
+
+
+class Checkpoint(NamedTuple):
+    steps: int
+    state: ProgramState
+    input_index: int
+    output_index: int
+
+
+class Replay:
+    def __init__(self, data: bytes) -> None:
+        if not data.startswith(TRACE_MAGIC):
+            raise Exception("Not an Intcode trace")
+        self.inputs: List[int] = []
+        self.outputs: List[int] = []
+        self.checkpoints: List[Checkpoint] = []
+        self.steps = 0
+
+        pages: List[Page] = []
+        pos = len(TRACE_MAGIC)
+        try:
+            while pos < len(data):
+                tag = data[pos]
+                step_delta, pos = read_varint(data, pos + 1)
+                self.steps += step_delta
+                if tag == TRACE_INPUT:
+                    delta, pos = read_varint(data, pos)
+                    self.inputs.append((self.inputs[-1] if self.inputs else 0) + unzigzag(delta))
+                elif tag == TRACE_OUTPUT:
+                    delta, pos = read_varint(data, pos)
+                    self.outputs.append((self.outputs[-1] if self.outputs else 0) + unzigzag(delta))
+                elif tag == TRACE_CHECKPOINT:
+                    pointer, pos = read_varint(data, pos)
+                    relative_base, pos = read_varint(data, pos)
+                    ended, pos = read_varint(data, pos)
+                    pos = read_pages(data, pos, pages)
+                    sparse, pos = read_sparse_pages(data, pos)
+                    pending_outputs, pos = read_values(data, pos)
+                    state = ProgramState(tuple(pages), unzigzag(pointer), unzigzag(relative_base), (), bool(ended), (), tuple(pending_outputs), sparse)
+                    self.checkpoints.append(Checkpoint(self.steps, state, len(self.inputs), len(self.outputs)))
+                else:
+                    raise Exception(f"Unknown trace record {tag} at byte {pos}")
+        except IndexError:
+            # A session that crashed mid-write leaves a partial last record behind
+            pass
+
+    def checkpoint_before(self, steps: int) -> int:
+        index = bisect_right([checkpoint.steps for checkpoint in self.checkpoints], steps) - 1
+        if index < 0:
+            raise Exception(f"No checkpoint at or before step {steps}")
+        return index
+
+    def resume(self, program: ProgramType, index: int = -1) -> ProgramType:
+        checkpoint = self.checkpoints[index]
+        program.restore(checkpoint.state._replace(input=tuple(self.inputs[checkpoint.input_index:])))
+        return program
+
+    def outputs_after(self, index: int = -1) -> List[int]:
+        return self.outputs[self.checkpoints[index].output_index:]
+
+
+def load_trace(path: str) -> Replay:
+    with open(path, "rb") as f:
+        return Replay(f.read())
@@ -0,0 +1,151 @@
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from intcode_computer import OpCode, PARAM_COUNTS, Program, get_param_mode
+
+MAX_LANE_MEMORY = 1 << 16
+SAFE_PRODUCT_OPERAND = 1 << 31
+SAFE_SUM_OPERAND = 1 << 62
+
+WRITING_OPS = {OpCode.ADD, OpCode.MUL, OpCode.LESS_THAN, OpCode.EQUALS, OpCode.INPUT}
+
+
+class VectorProgram:
+    def __init__(self, program: Sequence[int], lanes: int, input_data: Optional[Sequence[Sequence[int]]] = None) -> None:
+        self.lanes = lanes
+        self.memory = np.tile(np.array(program, dtype=np.int64), (lanes, 1))
+        self.pointer = np.zeros(lanes, dtype=np.int64)
+        self.relative_base = np.zeros(lanes, dtype=np.int64)
+        self.ended = np.zeros(lanes, dtype=bool)
+
+        input_lists = input_data if input_data is not None else [[] for _ in range(lanes)]
+        if len(input_lists) != lanes:
+            raise Exception(f"Expected input for {lanes} lanes but got {len(input_lists)}")
+        self.input = np.zeros((lanes, max((len(i) for i in input_lists), default=0)), dtype=np.int64)
+        for lane, values in enumerate(input_lists):
+            self.input[lane, :len(values)] = values
+        self.input_len = np.array([len(i) for i in input_lists], dtype=np.int64)
+        self.input_pos = np.zeros(lanes, dtype=np.int64)
+
+        self.outputs: List[List[int]] = [[] for _ in range(lanes)]
+        self.scalar_lanes: Dict[int, Program] = {}
+
+    def set_cell(self, address: int, values: Sequence[int]) -> None:
+        self.grow(address + 1)
+        self.memory[:, address] = values
+
+    def cell(self, address: int) -> List[int]:
+        result = [int(v) for v in self.column(np.arange(self.lanes), address)]
+        for lane, program in self.scalar_lanes.items():
+            result[lane] = program[address]
+        return result
+
+    def grow(self, size: int) -> None:
+        width = self.memory.shape[1]
+        if size > width:
+            new_width = min(max(size, width * 2), MAX_LANE_MEMORY)
+            self.memory = np.pad(self.memory, ((0, 0), (0, new_width - width)))
+
+    def read(self, lanes: np.ndarray, addresses: np.ndarray) -> np.ndarray:
+        in_range = (addresses >= 0) & (addresses < self.memory.shape[1])
+        if in_range.all():
+            return self.memory[lanes, addresses]
+        result = np.zeros(len(lanes), dtype=np.int64)
+        result[in_range] = self.memory[lanes[in_range], addresses[in_range]]
+        return result
+
+    def column(self, lanes: np.ndarray, address: int) -> np.ndarray:
+        if 0 <= address < self.memory.shape[1]:
+            return self.memory[lanes, address]
+        return np.zeros(len(lanes), dtype=np.int64)
+
+    def split_off(self, lanes: np.ndarray) -> None:
+        for lane in lanes.tolist():
+            program = Program(self.memory[lane].tolist())
+            program.pointer = int(self.pointer[lane])
+            program.relative_base = int(self.relative_base[lane])
+            program.input = deque(self.input[lane, self.input_pos[lane]:self.input_len[lane]].tolist())
+            self.outputs[lane].extend(program)
+            self.scalar_lanes[lane] = program
+            self.ended[lane] = True
+
+    def execute(self, address: int, word: int, lanes: np.ndarray) -> None:
+        param_modes, op_val = divmod(word, 100)
+        op = OpCode(op_val)
+        modes = [get_param_mode(param_modes, i) for i in range(PARAM_COUNTS[op])]
+        raw = [self.column(lanes, address + 1 + i) for i in range(len(modes))]
+
+        def value(i: int) -> np.ndarray:
+            if modes[i] == 1:
+                return raw[i]
+            elif modes[i] == 2:
+                return self.read(lanes, self.relative_base[lanes] + raw[i])
+            else:
+                return self.read(lanes, raw[i])
+
+        if op in WRITING_OPS:
+            target = self.relative_base[lanes] + raw[-1] if modes[-1] == 2 else raw[-1]
+            if (target < 0).any():
+                raise Exception(f"Tried to write to negative address {int(target.min())}")
+            split = target >= MAX_LANE_MEMORY
+            if op == OpCode.INPUT:
+                if (self.input_pos[lanes] >= self.input_len[lanes]).any():
+                    raise Exception("Program asked for input but none was available")
+                result = self.input[lanes, self.input_pos[lanes]]
+            else:
+                a, b = value(0), value(1)
+                if op == OpCode.ADD:
+                    split |= (a >= SAFE_SUM_OPERAND) | (a <= -SAFE_SUM_OPERAND) | (b >= SAFE_SUM_OPERAND) | (b <= -SAFE_SUM_OPERAND)
+                    result = a + b
+                elif op == OpCode.MUL:
+                    split |= (a >= SAFE_PRODUCT_OPERAND) | (a <= -SAFE_PRODUCT_OPERAND) | (b >= SAFE_PRODUCT_OPERAND) | (b <= -SAFE_PRODUCT_OPERAND)
+                    result = a * b
+                elif op == OpCode.LESS_THAN:
+                    result = (a < b).astype(np.int64)
+                else:
+                    result = (a == b).astype(np.int64)
+            if split.any():
+                self.split_off(lanes[split])
+                lanes, target, result = lanes[~split], target[~split], result[~split]
+                if len(lanes) == 0:
+                    return
+            if op == OpCode.INPUT:
+                self.input_pos[lanes] += 1
+            self.grow(int(target.max()) + 1)
+            self.memory[lanes, target] = result
+        elif op == OpCode.OUTPUT:
+            for lane, output in zip(lanes.tolist(), value(0).tolist()):
+                self.outputs[lane].append(output)
+        elif op in (OpCode.JUMP_IF_TRUE, OpCode.JUMP_IF_FALSE):
+            jump = (value(0) != 0) == (op == OpCode.JUMP_IF_TRUE)
+            self.pointer[lanes] = np.where(jump, value(1), address + 3)
+            return
+        elif op == OpCode.MOVE_RELATIVE_BASE:
+            self.relative_base[lanes] += value(0)
+        elif op == OpCode.END:
+            self.ended[lanes] = True
+        self.pointer[lanes] = address + len(modes) + 1
+
+    def run(self) -> List[List[int]]:
+        while True:
+            active = np.flatnonzero(~self.ended)
+            if len(active) == 0:
+                return self.outputs
+            pointers = self.pointer[active]
+            if (pointers == pointers[0]).all():
+                address = int(pointers[0])
+                lanes = active
+            else:
+                addresses, counts = np.unique(pointers, return_counts=True)
+                address = int(addresses[counts.argmax()])
+                lanes = active[pointers == address]
+            words = self.column(lanes, address)
+            if not (words == words[0]).all():
+                lanes = lanes[words == words[0]]
+            self.execute(address, int(words[0]), lanes)
+
+
+def run_lanes(program: Sequence[int], input_lists: Sequence[Sequence[int]]) -> List[List[int]]:
+    return VectorProgram(program, len(input_lists), input_lists).run()
@@ -0,0 +1,77 @@
+import os
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+from intcode_computer import Program, ProgramImage, ProgramState
+from intcode_trace import read_pages, read_sparse_pages, read_values, read_varint, unzigzag, write_pages, write_sparse_pages, write_values, write_varint, zigzag
+
+WARM_START_MAGIC = b"ICWS\x02"
+
+
+class WarmStart(NamedTuple):
+    state: ProgramState
+    outputs: List[int]
+
+
+def save_warm_start(path: str, image: ProgramImage, program: Program, outputs: Sequence[int] = ()) -> None:
+    record = bytearray(WARM_START_MAGIC)
+    record.extend(image.fingerprint().encode())
+    write_varint(record, zigzag(program.pointer))
+    write_varint(record, zigzag(program.relative_base))
+    write_varint(record, 1 if program.ended else 0)
+    # Programs start out sharing the image's pages, so only the pages the program wrote are stored
+    write_pages(record, program.memory.snapshot(), image.pages)
+    write_sparse_pages(record, program.memory.sparse_snapshot())
+    write_values(record, program.input)
+    write_values(record, program.pending_outputs)
+    write_values(record, outputs)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as fout:
+        fout.write(record)
+    os.replace(temp_path, path)
+
+
+def load_warm_start(path: str, image: ProgramImage) -> Optional[WarmStart]:
+    try:
+        with open(path, "rb") as fin:
+            data = fin.read()
+    except FileNotFoundError:
+        return None
+    fingerprint = image.fingerprint().encode()
+    header = WARM_START_MAGIC + fingerprint
+    if not data.startswith(header):
+        # Written by another version or for a different program image
+        return None
+    try:
+        pointer, pos = read_varint(data, len(header))
+        relative_base, pos = read_varint(data, pos)
+        ended, pos = read_varint(data, pos)
+        pages = list(image.pages)
+        pos = read_pages(data, pos, pages)
+        sparse, pos = read_sparse_pages(data, pos)
+        input_data, pos = read_values(data, pos)
+        pending_outputs, pos = read_values(data, pos)
+        outputs, pos = read_values(data, pos)
+    except IndexError:
+        return None
+    state = ProgramState(tuple(pages), unzigzag(pointer), unzigzag(relative_base), tuple(input_data), bool(ended), (), tuple(pending_outputs), sparse)
+    return WarmStart(state, outputs)
+
+
+def warm_start(image: ProgramImage, path: Optional[str], prepare: Optional[Callable[[Program], Any]] = None,
+               program_class: Type[Program] = Program) -> Tuple[Program, List[int]]:
+    # Boots image up to the first time it asks for input, reusing the state saved at path by an
+    # earlier run of the same image; prepare sees the program just before it is handed back or run.
+    # Without a path the program is always booted from scratch
+    program = program_class(image)
+    saved = load_warm_start(path, image) if path is not None else None
+    if saved is not None:
+        program.restore(saved.state)
+        if prepare is not None:
+            prepare(program)
+        return program, saved.outputs
+    if prepare is not None:
+        prepare(program)
+    outputs = program.run_until_blocked()[1]
+    if path is not None:
+        save_warm_start(path, image, program, outputs)
+    return program, outputs
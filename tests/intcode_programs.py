@@ -0,0 +1,121 @@
+from typing import Dict, List, Sequence, Tuple, Union
+
+Operand = Union[int, str]
+Line = Union[str, Tuple]
+
+OPS = {"add": (1, 3), "mul": (2, 3), "in": (3, 1), "out": (4, 1), "jt": (5, 2), "jf": (6, 2),
+       "lt": (7, 3), "eq": (8, 3), "arb": (9, 1), "hlt": (99, 0)}
+
+
+def asm(lines: Sequence[Line]) -> List[int]:
+    # Operands: 5 is immediate, "[5]" position, "{5}" relative, "@label" the label's address
+    # as an immediate and "[@label]" the cell at the label. A line "name:" defines a label and
+    # ("data", [...]) emits raw cells.
+    labels: Dict[str, int] = {}
+    address = 0
+    for line in lines:
+        if isinstance(line, str):
+            labels[line[:-1]] = address
+        elif line[0] == "data":
+            address += len(line[1])
+        else:
+            address += 1 + OPS[line[0]][1]
+
+    def operand(value: Operand) -> Tuple[int, int]:
+        if isinstance(value, int):
+            return 1, value
+        if value.startswith("@"):
+            return 1, labels[value[1:]]
+        inner = value[1:-1]
+        target = labels[inner[1:]] if inner.startswith("@") else int(inner)
+        return (0 if value.startswith("[") else 2), target
+
+    program: List[int] = []
+    for line in lines:
+        if isinstance(line, str):
+            continue
+        if line[0] == "data":
+            program.extend(line[1])
+            continue
+        code, _ = OPS[line[0]]
+        operands = [operand(value) for value in line[1:]]
+        program.append(code + sum(mode * 10 ** (i + 2) for i, (mode, _) in enumerate(operands)))
+        program.extend(value for _, value in operands)
+    return program
+
+
+QUINE = [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+COMPARE_TO_8 = [3, 21, 1008, 21, 8, 20, 1005, 20, 22, 107, 8, 21, 20, 1006, 20, 31, 1106, 0, 36, 98, 0, 0, 1002, 21, 125, 20, 4, 20, 1105, 1, 46, 104, 999, 1105, 1, 46, 1101, 1000, 1, 20, 4, 20, 1105, 1, 46, 98, 99]
+LARGE_PRODUCT = [1102, 34915192, 34915192, 7, 4, 7, 99, 0]
+NOUN_VERB = [1, 0, 0, 3, 1, 1, 2, 3, 1, 3, 4, 3, 1, 5, 0, 3, 2, 1, 10, 19, 1, 6, 19, 23, 2, 23, 6, 27, 1, 5, 27, 31, 1, 31, 9, 35, 2, 10, 35, 39, 1, 5, 39, 43, 2, 43, 10, 47, 1, 47, 6, 51, 2, 51, 6, 55, 2, 55, 13, 59, 2, 6, 59, 63, 1, 63, 5, 67, 1, 6, 67, 71, 2, 71, 9, 75, 1, 6, 75, 79, 2, 13, 79, 83, 1, 9, 83, 87, 1, 87, 13, 91, 2, 91, 10, 95, 1, 6, 95, 99, 1, 99, 13, 103, 1, 13, 103, 107, 2, 107, 10, 111, 1, 9, 111, 115, 1, 115, 10, 119, 1, 5, 119, 123, 1, 6, 123, 127, 1, 10, 127, 131, 1, 2, 131, 135, 1, 135, 10, 0, 99, 2, 14, 0, 0]
+
+# Prints a zero-terminated greeting through a subroutine, then reads n and prints fib(n)
+# computed by a recursive subroutine. Both use the usual frame convention: the caller
+# leaves the return address at {0} and the argument at {1}, the callee opens its frame
+# with "arb +4" and returns with "arb -4; jf 0 {0}".
+FIBONACCI = asm([
+    ("arb", "@stack"),
+    ("add", "@greeting", 0, "{1}"),
+    ("add", "@after_print", 0, "{0}"),
+    ("jt", 1, "@print"),
+    "after_print:",
+    ("in", "{1}"),
+    ("add", "@after_fib", 0, "{0}"),
+    ("jt", 1, "@fib"),
+    "after_fib:",
+    ("out", "{1}"),
+    ("hlt",),
+    "fib:",
+    ("arb", 4),
+    ("lt", "{-3}", 2, "{-2}"),
+    ("jt", "{-2}", "@fib_done"),
+    ("add", "{-3}", -1, "{1}"),
+    ("add", "@fib_first", 0, "{0}"),
+    ("jt", 1, "@fib"),
+    "fib_first:",
+    ("add", "{1}", 0, "{-1}"),
+    ("add", "{-3}", -2, "{1}"),
+    ("add", "@fib_second", 0, "{0}"),
+    ("jt", 1, "@fib"),
+    "fib_second:",
+    ("add", "{1}", "{-1}", "{-3}"),
+    "fib_done:",
+    ("arb", -4),
+    ("jf", 0, "{0}"),
+    "print:",
+    ("arb", 4),
+    "print_next:",
+    # Patches the address of the load below so it reads the character at the pointer
+    ("add", "{-3}", 0, "[@load_address]"),
+    ("data", [21001]), "load_address:", ("data", [0, 0, -2]),
+    ("jf", "{-2}", "@print_done"),
+    ("out", "{-2}"),
+    ("add", "{-3}", 1, "{-3}"),
+    ("jt", 1, "@print_next"),
+    "print_done:",
+    ("arb", -4),
+    ("jf", 0, "{0}"),
+    "greeting:", ("data", [ord(c) for c in "Fib?\n"] + [0]),
+    "stack:",
+])
+
+
+def fibonacci(n: int) -> int:
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+# Prints running sums of the squares 0..29, walking the table by patching the operand of the
+# add at address 0 on every pass
+PATCHED_TABLE_SIZE = 30
+OPERAND_PATCHING = asm([
+    ("add", "[@acc]", "[@table]", "[@acc]"),
+    ("add", "[2]", 1, "[2]"),
+    ("out", "[@acc]"),
+    ("add", "[@n]", -1, "[@n]"),
+    ("jt", "[@n]", 0),
+    ("hlt",),
+    "n:", ("data", [PATCHED_TABLE_SIZE]), "acc:", ("data", [0]),
+    "table:", ("data", [i * i for i in range(PATCHED_TABLE_SIZE)]),
+])
@@ -0,0 +1,44 @@
+import asyncio
+
+import day7
+from intcode_async import AsyncProgram, async_program_class
+from intcode_computer import ProgramImage
+from intcode_jit import JitProgram
+from intcode_programs import COMPARE_TO_8
+
+# Feedback loop example from the puzzle, best with phase settings 9,8,7,6,5
+FEEDBACK_EXAMPLE = [3, 26, 1001, 26, -4, 26, 3, 27, 1002, 27, 2, 27, 1, 27, 26, 27, 4, 27, 1001, 28, -1, 28, 1005, 28, 6, 99, 0, 0, 5]
+
+
+def test_synchronous_api_still_works():
+    program = AsyncProgram(COMPARE_TO_8)
+    program.send_input(8)
+    assert list(program) == [1000]
+    program = AsyncProgram(COMPARE_TO_8)
+    program.send_inputs([7])
+    assert program.next_output() == 999
+    program = AsyncProgram([3, 0, 4, 0, 99])
+    program.write_string("")
+    assert list(program) == [ord("\n")]
+
+
+def test_feedback_loop():
+    image = ProgramImage(FEEDBACK_EXAMPLE)
+    assert day7.max_feedback_signal(image) == 139629729
+    assert day7.max_feedback_signal(image, JitProgram) == 139629729
+    assert async_program_class(JitProgram) is async_program_class(JitProgram)
+
+
+def test_blocked_program_waits_for_input():
+    async def session():
+        program = AsyncProgram(COMPARE_TO_8)
+        task = asyncio.create_task(program.run())
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert not task.done()
+        assert program.output_queue.empty()
+        program.send_input(9)
+        assert await program.recv_output() == 1001
+        assert await program.recv_output() is None
+        await task
+    asyncio.run(session())
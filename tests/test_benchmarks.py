@@ -0,0 +1,20 @@
+from benchmarks.__main__ import measure
+from intcode_computer import Program, RunStatus
+from intcode_programs import FIBONACCI
+
+
+def fused_watched_fibonacci(program_data, program_class):
+    program = program_class(program_data).fork()
+    program.send_input(10)
+    program.fuse_superinstructions()
+    program.watch(len(program_data) + 3)
+    while program.run_until_blocked()[0] is not RunStatus.HALTED:
+        pass
+
+
+def test_measure_counts_retired_instructions_past_fusion_watchpoints_and_forks():
+    plain = Program(FIBONACCI, [10])
+    profile = plain.enable_profiling()
+    plain.run_to_end()
+    result = measure(fused_watched_fibonacci, FIBONACCI, Program, 1)
+    assert result.instructions == profile.instructions
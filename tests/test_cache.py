@@ -0,0 +1,40 @@
+from intcode_cache import RunCache, program_digest
+from intcode_programs import COMPARE_TO_8, QUINE
+
+
+def test_cached_outputs_cannot_be_changed_by_callers():
+    cache = RunCache()
+    outputs = cache.run_to_end(COMPARE_TO_8, [9])
+    outputs.append(123)
+    assert cache.run_to_end(COMPARE_TO_8, [9]) == [1001]
+    cache.lookup(program_digest(COMPARE_TO_8), [9]).append(123)
+    assert cache.run_to_end(COMPARE_TO_8, [9]) == [1001]
+    stored = [5]
+    cache.store("digest", [], stored)
+    stored.append(6)
+    assert cache.lookup("digest", []) == [5]
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RunCache(max_entries=2)
+    digest = program_digest(COMPARE_TO_8)
+    cache.run_to_end(COMPARE_TO_8, [7], digest)
+    cache.run_to_end(COMPARE_TO_8, [8], digest)
+    assert cache.lookup(digest, [7]) == [999]
+    cache.run_to_end(COMPARE_TO_8, [9], digest)
+    assert cache.lookup(digest, [8]) is None
+    assert cache.lookup(digest, [7]) == [999]
+    assert cache.lookup(digest, [9]) == [1001]
+
+
+def test_sqlite_round_trip_outlives_eviction_and_the_cache(tmp_path):
+    path = str(tmp_path / "runs.sqlite")
+    with RunCache(max_entries=1, path=path) as cache:
+        assert cache.run_to_end(QUINE) == QUINE
+        assert cache.run_to_end(COMPARE_TO_8, [8]) == [1000]
+        cache.store("silent", [1, -2], [])
+        assert cache.lookup(program_digest(QUINE), []) == QUINE
+    with RunCache(path=path) as cache:
+        assert cache.lookup(program_digest(COMPARE_TO_8), [8]) == [1000]
+        assert cache.lookup("silent", [1, -2]) == []
+        assert cache.lookup("silent", [1]) is None
@@ -0,0 +1,107 @@
+import day13
+from intcode_jit import JitProgram
+from intcode_programs import asm
+
+WIDTH = 5
+# Three blocks along the top, the ball above the paddle on the bottom row
+FIRST_FRAME = [
+    [1, 2, 2, 2, 1],
+    [1, 0, 0, 0, 1],
+    [1, 0, 0, 0, 1],
+    [1, 0, 4, 0, 1],
+    [1, 0, 3, 0, 1],
+]
+BLOCK_SCORE = 10
+
+
+def breakout(offset=0, memory_collisions=True):
+    # The ball climbs straight up its column, knocks out the block at the top, falls back and
+    # bounces off the paddle into the next column. The screen is stored with offset added to every
+    # tile, and the paddle is found either by reading the screen or by comparing with its position
+    def locate(x, y):
+        return [("mul", y, WIDTH, "[@address]"), ("add", "[@address]", x, "[@address]"), ("add", "[@address]", "@screen", "[@address]")]
+
+    def load(x, y):
+        return locate(x, y) + [("arb", "[@address]"), ("add", "{0}", -offset, "[@value]"),
+                               ("mul", "[@address]", -1, "[@address]"), ("arb", "[@address]")]
+
+    def draw(x, y, tile):
+        return locate(x, y) + [("arb", "[@address]"), ("add", tile, offset, "{0}"),
+                               ("mul", "[@address]", -1, "[@address]"), ("arb", "[@address]"),
+                               ("out", x), ("out", y), ("out", tile)]
+
+    # day13 inserts quarters by writing 2 over the opcode at address 0, turning this add into a mul
+    lines = [("add", "[@flag]", "[@flag]", "[@flag]")]
+    for y, row in enumerate(FIRST_FRAME):
+        for x, tile in enumerate(row):
+            lines += [("out", x), ("out", y), ("out", tile)]
+    lines += [("out", -1), ("out", 0), ("out", 0)]
+
+    lines += ["frame:", ("in", "[@joystick]")]
+    lines += draw("[@paddle]", 4, 0)
+    lines += [("add", "[@paddle]", "[@joystick]", "[@paddle]")]
+    lines += draw("[@paddle]", 4, 3)
+    lines += draw("[@ball]", "[@height]", 0)
+    lines += [("add", "[@height]", "[@direction]", "[@height]")]
+    lines += draw("[@ball]", "[@height]", 4)
+    lines += [("eq", "[@height]", 1, "[@flag]"), ("jt", "[@flag]", "@top"),
+              ("eq", "[@height]", 3, "[@flag]"), ("jt", "[@flag]", "@bottom"),
+              ("jt", 1, "@frame")]
+
+    lines += ["top:", ("add", 1, 0, "[@direction]")]
+    lines += load("[@ball]", 0)
+    lines += [("eq", "[@value]", 2, "[@flag]"), ("jf", "[@flag]", "@frame")]
+    lines += draw("[@ball]", 0, 0)
+    lines += [("add", "[@blocks]", -1, "[@blocks]"), ("add", "[@score]", BLOCK_SCORE, "[@score]"),
+              ("out", -1), ("out", 0), ("out", "[@score]"),
+              ("jt", "[@blocks]", "@frame"), ("hlt",)]
+
+    lines += ["bottom:", ("add", -1, 0, "[@direction]")]
+    if memory_collisions:
+        lines += load("[@ball]", 4)
+        lines += [("eq", "[@value]", 3, "[@flag]")]
+    else:
+        lines += [("eq", "[@ball]", "[@paddle]", "[@flag]")]
+    lines += [("jt", "[@flag]", "@bounce"), ("hlt",), "bounce:"]
+    lines += draw("[@ball]", 3, 0)
+    lines += [("eq", "[@ball]", 3, "[@flag]"), ("jt", "[@flag]", "@wrap"),
+              ("add", "[@ball]", 1, "[@ball]"), ("jt", 1, "@moved"),
+              "wrap:", ("add", 1, 0, "[@ball]"), "moved:"]
+    lines += draw("[@ball]", 3, 4)
+    lines += [("jt", 1, "@frame")]
+
+    for name, value in [("joystick", 0), ("paddle", 2), ("ball", 2), ("height", 3), ("direction", -1),
+                        ("blocks", 3), ("score", 0), ("address", 0), ("value", 0), ("flag", 0)]:
+        lines += [f"{name}:", ("data", [value])]
+    lines += ["screen:", ("data", [tile + offset for row in FIRST_FRAME for tile in row])]
+    return asm(lines)
+
+
+def count_frame_play(monkeypatch):
+    calls = []
+    play_frames = day13.play_frames
+
+    def counted(program, board):
+        calls.append(program)
+        play_frames(program, board)
+    monkeypatch.setattr(day13, "play_frames", counted)
+    return calls
+
+
+def test_screen_in_memory_is_won_with_a_paddle_wall(monkeypatch):
+    frame_plays = count_frame_play(monkeypatch)
+    assert day13.play(breakout()) == (3, 3 * BLOCK_SCORE)
+    assert day13.play(breakout(), JitProgram) == (3, 3 * BLOCK_SCORE)
+    assert frame_plays == []
+
+
+def test_screen_not_in_memory_is_played_from_the_output(monkeypatch):
+    frame_plays = count_frame_play(monkeypatch)
+    assert day13.play(breakout(offset=10)) == (3, 3 * BLOCK_SCORE)
+    assert len(frame_plays) == 1
+
+
+def test_paddle_wall_that_loses_falls_back_to_the_output(monkeypatch):
+    frame_plays = count_frame_play(monkeypatch)
+    assert day13.play(breakout(memory_collisions=False)) == (3, 3 * BLOCK_SCORE)
+    assert len(frame_plays) == 1
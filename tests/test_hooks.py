@@ -0,0 +1,118 @@
+from io import BytesIO
+
+from intcode_computer import Program, RunStatus
+from intcode_jit import JitProgram
+from intcode_programs import asm
+from intcode_trace import Replay, enable_tracing
+
+# Reads values forever, doubling each one in place and printing it
+DOUBLER = asm([
+    "start:",
+    ("in", "[@cell]"),
+    ("mul", "[@cell]", 2, "[@cell]"),
+    ("out", "[@cell]"),
+    ("jt", 1, "@start"),
+    "cell:", ("data", [0]),
+])
+CELL = len(DOUBLER) - 1
+
+
+class StepCountingProgram(Program):
+    def __init__(self, program, input_data=None):
+        super().__init__(program, input_data)
+        self.steps = 0
+
+    def next_command(self):
+        self.steps += 1
+        return super().next_command()
+
+
+def run_past_watchpoints(program):
+    outputs = []
+    while True:
+        status, new_outputs = program.run_until_blocked()
+        outputs.extend(new_outputs)
+        if status is not RunStatus.WATCHPOINT:
+            return status, outputs
+
+
+def test_profiling_after_tracing_keeps_recording():
+    program = Program(DOUBLER, [1, 2, 3])
+    stream = BytesIO()
+    trace = enable_tracing(program, stream)
+    profile = program.enable_profiling()
+    assert program.run_until_blocked() == (RunStatus.NEEDS_INPUT, [2, 4, 6])
+    trace.stop()
+    replay = Replay(stream.getvalue())
+    assert replay.inputs == [1, 2, 3]
+    assert replay.outputs == [2, 4, 6]
+    assert profile.instructions == 12
+
+
+def test_watchpoint_survives_tracing_and_profiling_toggles():
+    program = Program(DOUBLER, [5])
+    program.watch(CELL)
+    trace = enable_tracing(program, BytesIO())
+    trace.stop()
+    program.enable_profiling()
+    program.disable_profiling()
+    assert program.run_until_blocked()[0] is RunStatus.WATCHPOINT
+
+
+def test_hooks_enabled_after_watch_see_every_step():
+    program = Program(DOUBLER, [1, 2, 3])
+    program.watch(CELL)
+    stream = BytesIO()
+    trace = enable_tracing(program, stream)
+    profile = program.enable_profiling()
+    assert program.run_until_blocked() == (RunStatus.WATCHPOINT, [])
+    assert run_past_watchpoints(program) == (RunStatus.NEEDS_INPUT, [2, 4, 6])
+    trace.stop()
+    replay = Replay(stream.getvalue())
+    assert replay.inputs == [1, 2, 3]
+    assert replay.outputs == [2, 4, 6]
+    assert profile.instructions == 12
+
+
+def test_unwatch_keeps_other_hooks():
+    program = Program(DOUBLER, [1, 2])
+    watchpoint = program.watch(CELL)
+    profile = program.enable_profiling()
+    program.unwatch(watchpoint)
+    assert program.run_until_blocked() == (RunStatus.NEEDS_INPUT, [2, 4])
+    assert profile.instructions == 8
+
+
+def test_fork_starts_without_hooks():
+    program = Program(DOUBLER, [1])
+    program.watch(CELL)
+    program.enable_profiling()
+    clone = program.fork()
+    assert "next_command" not in clone.__dict__
+    assert clone.run_until_blocked() == (RunStatus.NEEDS_INPUT, [2])
+    assert program.run_until_blocked()[0] is RunStatus.WATCHPOINT
+
+
+def test_hooks_wrap_the_subclass_step():
+    program = StepCountingProgram(DOUBLER, [1, 2])
+    program.watch(CELL)
+    profile = program.enable_profiling()
+    assert run_past_watchpoints(program) == (RunStatus.NEEDS_INPUT, [2, 4])
+    assert profile.instructions == 8
+    # The last step is the INPUT that found nothing to read
+    assert program.steps == 9
+
+
+def test_hooked_jit_program_runs_interpreted_until_unhooked():
+    values = list(range(50))
+    program = JitProgram(DOUBLER, values)
+    profile = program.enable_profiling()
+    assert not program.compiling
+    assert program.run_until_blocked() == (RunStatus.NEEDS_INPUT, [2 * value for value in values])
+    assert profile.instructions == 4 * len(values)
+    assert program.blocks == {}
+    program.disable_profiling()
+    assert program.compiling
+    program.send_inputs(values)
+    assert program.run_until_blocked() == (RunStatus.NEEDS_INPUT, [2 * value for value in values])
+    assert program.blocks
@@ -0,0 +1,63 @@
+import pytest
+
+from intcode_computer import Program, ascii_lines
+from intcode_programs import asm
+
+
+def printer(values):
+    return asm([("out", value) for value in values] + [("hlt",)])
+
+
+# Echoes every input until it reads a 0
+ECHO = asm(["loop:", ("in", "[@value]"), ("jf", "[@value]", "@done"), ("out", "[@value]"), ("jt", 1, "@loop"),
+            "done:", ("hlt",), "value:", ("data", [0])])
+
+
+def test_read_outputs_reads_exactly_n():
+    program = Program(printer([1, 2, 3, 4, 5]))
+    assert program.read_outputs(0) == []
+    assert program.read_outputs(2) == [1, 2]
+    assert program.read_outputs(3) == [3, 4, 5]
+    with pytest.raises(Exception, match="reached end"):
+        program.read_outputs(1)
+
+
+def test_read_records_yields_fixed_size_records():
+    assert list(Program(printer([1, 2, 3, 4, 5, 6])).read_records(3)) == [[1, 2, 3], [4, 5, 6]]
+    assert list(Program(printer([])).read_records(3)) == []
+    records = Program(printer([1, 2, 3, 4])).read_records(3)
+    assert next(records) == [1, 2, 3]
+    # A record cut short by the program halting is an error, not a shorter record
+    with pytest.raises(Exception, match="reached end"):
+        next(records)
+
+
+def test_read_until_and_read_line():
+    program = Program(printer([7, 8, 0, 0, 9]))
+    assert program.read_until(0) == [7, 8]
+    assert program.read_until(0) == []
+    assert program.read_until(0) is None
+    program = Program(printer([ord(c) for c in "ab\n\nc"]))
+    assert program.read_line() == "ab"
+    assert program.read_line() == ""
+    assert program.read_line() is None
+
+
+def test_send_inputs_queues_in_order():
+    bulk = Program(ECHO)
+    bulk.send_inputs([3, -1, 4])
+    bulk.send_inputs(iter([5, 0]))
+    single = Program(ECHO)
+    for value in [3, -1, 4, 5, 0]:
+        single.send_input(value)
+    assert list(bulk) == list(single) == [3, -1, 4, 5]
+    program = Program(ECHO)
+    program.write_string("hi")
+    program.send_input(0)
+    assert list(program) == [ord("h"), ord("i"), ord("\n")]
+
+
+def test_ascii_lines_keeps_only_complete_lines():
+    assert ascii_lines([ord(c) for c in "one\n\ntwo\nthr"]) == ["one", "", "two"]
+    assert ascii_lines([ord(c) for c in "one\n"]) == ["one"]
+    assert ascii_lines([]) == []
@@ -0,0 +1,78 @@
+from intcode_computer import Program, RunStatus
+from intcode_jit import HOT_THRESHOLD, JitProgram
+from intcode_loops import find_loops, summarize_loops
+from intcode_programs import OPERAND_PATCHING, asm
+
+PASSES = HOT_THRESHOLD + 6
+# Adds each of four table entries to acc PASSES times, printing acc every time, then patches the
+# add's operand to the next entry; the add gets hot and compiled before every patch
+REPEATED_PATCHING = asm([
+    ("add", "[@acc]", "[@table]", "[@acc]"),
+    ("out", "[@acc]"),
+    ("add", "[@i]", -1, "[@i]"),
+    ("jt", "[@i]", 0),
+    ("add", PASSES, 0, "[@i]"),
+    ("add", "[2]", 1, "[2]"),
+    ("add", "[@n]", -1, "[@n]"),
+    ("jt", "[@n]", 0),
+    ("hlt",),
+    "n:", ("data", [4]), "i:", ("data", [PASSES]), "acc:", ("data", [0]), "table:", ("data", [1, 10, 100, 1000]),
+])
+
+# Reads counts until a 0, printing 7 times the running total after each; the inner loop is a
+# summarizable top-tested countdown
+REPEATED_COUNTDOWN = asm([
+    "start:",
+    ("in", "[@n]"),
+    ("jf", "[@n]", "@done"),
+    "loop:",
+    ("jf", "[@n]", "@after"),
+    ("add", "[@acc]", 7, "[@acc]"),
+    ("add", "[@n]", -1, "[@n]"),
+    ("jt", 1, "@loop"),
+    "after:",
+    ("out", "[@acc]"),
+    ("jt", 1, "@start"),
+    "done:",
+    ("hlt",),
+    "n:", ("data", [0]), "acc:", ("data", [0]),
+])
+
+
+class CompileCountingProgram(JitProgram):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compiled = []
+
+    def compile_block(self, start):
+        self.compiled.append(start)
+        return super().compile_block(start)
+
+
+def memory(program, size):
+    return [program[address] for address in range(size)]
+
+
+def test_operand_patching_loops_match_the_interpreter():
+    for code in (OPERAND_PATCHING, REPEATED_PATCHING):
+        interpreted = Program(code)
+        compiled = CompileCountingProgram(code)
+        assert list(compiled) == list(interpreted)
+        assert memory(compiled, len(code)) == memory(interpreted, len(code))
+    # Every patch drops the compiled add, which is compiled again once it is hot
+    assert compiled.compiled.count(0) == 4
+    assert 0 not in compiled.blocks
+
+
+def test_blocks_end_at_loop_summaries():
+    loops = find_loops(Program(REPEATED_COUNTDOWN))
+    assert len(loops) == 1
+    counts = [10 ** 6] * (HOT_THRESHOLD * 2)
+    program = JitProgram(REPEATED_COUNTDOWN, counts + [0])
+    assert summarize_loops(program) == 1
+    status, outputs = program.run_for(100 * len(counts))
+    assert status is RunStatus.HALTED
+    assert outputs == [7 * 10 ** 6 * (i + 1) for i in range(len(counts))]
+    assert program.blocks and loops[0].start not in program.blocks
+    assert all(address + instruction.size <= loops[0].start or address >= loops[0].end
+               for block_start in program.blocks for address, instruction in program.find_block(block_start))
@@ -0,0 +1,76 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from intcode_computer import PAGE_SIZE, Program
+from intcode_loader import load_program, map_image, map_program
+from intcode_pool import run_many
+from intcode_programs import COMPARE_TO_8, FIBONACCI, fibonacci
+
+
+def write_source(path, program):
+    path.write_text(",".join(map(str, program)) + "\n")
+
+
+def test_image_is_reused_and_replaced_when_the_source_changes(tmp_path):
+    source = tmp_path / "input"
+    write_source(source, COMPARE_TO_8)
+    assert load_program(str(source)) == COMPARE_TO_8
+    first_images = list(tmp_path.glob("input.*.qimg"))
+    assert len(first_images) == 1
+    assert load_program(str(source)) == COMPARE_TO_8
+
+    write_source(source, FIBONACCI)
+    assert load_program(str(source)) == FIBONACCI
+    images = list(tmp_path.glob("input.*.qimg"))
+    assert len(images) == 1 and images != first_images
+
+
+def test_sibling_sources_keep_their_images(tmp_path):
+    write_source(tmp_path / "input.txt", COMPARE_TO_8)
+    load_program(str(tmp_path / "input.txt"))
+    write_source(tmp_path / "input", FIBONACCI)
+    load_program(str(tmp_path / "input"))
+    write_source(tmp_path / "input", COMPARE_TO_8)
+    load_program(str(tmp_path / "input"))
+    assert len(list(tmp_path.glob("input.txt.*.qimg"))) == 1
+    assert len(list(tmp_path.glob("input.????????????????.qimg"))) == 1
+
+
+def test_mapped_image_shares_pages_until_written(tmp_path):
+    source = tmp_path / "input"
+    write_source(source, FIBONACCI * 8)
+    image = map_image(str(source))
+    assert isinstance(image.pages[0], memoryview)
+    program = Program(image, [10])
+    program[0] = 99
+    assert program[0] == 99
+    assert map_program(str(source))[0] == FIBONACCI[0]
+    assert list(Program(image, [10])) == list(Program(FIBONACCI, [10]))
+
+
+def test_run_many_maps_the_program_file(tmp_path):
+    source = tmp_path / "input"
+    write_source(source, FIBONACCI)
+    outputs = run_many(str(source), [[n] for n in range(10)], max_workers=2)
+    assert [output[-1] for output in outputs] == [fibonacci(n) for n in range(10)]
+
+
+def mapped_length(path):
+    return len(map_program(path))
+
+
+def test_concurrent_image_writes_leave_one_image(tmp_path):
+    source = tmp_path / "input"
+    program = FIBONACCI + [0] * (PAGE_SIZE * 400)
+    write_source(source, program)
+    with ProcessPoolExecutor(8) as executor:
+        assert list(executor.map(mapped_length, [str(source)] * 32)) == [len(program)] * 32
+    assert len(list(tmp_path.glob("input.*.qimg"))) == 1
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_run_many_maps_a_fresh_multi_page_program_from_many_workers(tmp_path):
+    source = tmp_path / "input"
+    write_source(source, FIBONACCI + [0] * (PAGE_SIZE * 400))
+    outputs = run_many(str(source), [[n % 12] for n in range(64)], max_workers=8, chunksize=1)
+    assert [output[-1] for output in outputs] == [fibonacci(n % 12) for n in range(64)]
+    assert len(list(tmp_path.glob("input.*.qimg"))) == 1
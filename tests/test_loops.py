@@ -0,0 +1,144 @@
+import pytest
+
+from intcode_computer import Program, ProgramImage, RunStatus, Specializer
+from intcode_jit import JitProgram
+from intcode_loops import find_loops, summarize_loops
+from intcode_programs import asm
+
+# Reads n and prints the sum 1 + ... + n, counting n down to zero with a test at the bottom
+COUNT = [3, 100, 1101, 0, 0, 101, 1, 101, 100, 101, 1001, 100, -1, 100, 1005, 100, 6, 4, 101, 99]
+STEP = 12
+
+# Multiplies a by b through repeated addition, testing i < b at the top of the loop
+TOP_COMPARE = asm([
+    ("in", "[@a]"),
+    ("in", "[@b]"),
+    "loop:",
+    ("lt", "[@i]", "[@b]", "[@t]"),
+    ("jf", "[@t]", "@done"),
+    ("add", "[@acc]", "[@a]", "[@acc]"),
+    ("add", "[@i]", 1, "[@i]"),
+    ("jt", 1, "@loop"),
+    "done:",
+    ("out", "[@acc]"), ("out", "[@i]"), ("out", "[@t]"),
+    ("hlt",),
+    "a:", ("data", [0]), "b:", ("data", [0]), "i:", ("data", [0]), "acc:", ("data", [0]), "t:", ("data", [0]),
+])
+# Adds 7 to acc n times, testing n directly at the top
+TOP_JUMP = asm([
+    ("in", "[@n]"),
+    "loop:",
+    ("jf", "[@n]", "@done"),
+    ("add", "[@acc]", 7, "[@acc]"),
+    ("add", "[@n]", -1, "[@n]"),
+    ("jt", 1, "@loop"),
+    "done:",
+    ("out", "[@acc]"), ("out", "[@n]"),
+    ("hlt",),
+    "n:", ("data", [0]), "acc:", ("data", [0]),
+])
+# Sums 1 + ... + n with the exit test in the middle of the body
+MIDDLE_EXIT = asm([
+    ("in", "[@n]"),
+    "loop:",
+    ("add", "[@i]", 1, "[@i]"),
+    ("lt", "[@n]", "[@i]", "[@t]"),
+    ("jt", "[@t]", "@done"),
+    ("add", "[@acc]", "[@i]", "[@acc]"),
+    ("jt", 1, "@loop"),
+    "done:",
+    ("out", "[@acc]"), ("out", "[@i]"),
+    ("hlt",),
+    "n:", ("data", [0]), "i:", ("data", [0]), "acc:", ("data", [0]), "t:", ("data", [0]),
+])
+# Steps i by 3 until it equals n, keeping a scratch product in a temporary
+BOTTOM_EQUALS = asm([
+    ("in", "[@n]"),
+    "loop:",
+    ("mul", "[@i]", 2, "[@tmp]"),
+    ("add", "[@acc]", "[@tmp]", "[@acc]"),
+    ("add", "[@i]", 3, "[@i]"),
+    ("eq", "[@i]", "[@n]", "[@t]"),
+    ("jf", "[@t]", "@loop"),
+    ("out", "[@acc]"), ("out", "[@tmp]"), ("out", "[@t]"),
+    ("hlt",),
+    "n:", ("data", [0]), "i:", ("data", [0]), "acc:", ("data", [5]), "t:", ("data", [0]), "tmp:", ("data", [0]),
+])
+# Doubles x n times: not an arithmetic series, so it is left to the interpreter
+DOUBLING = asm([
+    ("in", "[@n]"),
+    "loop:",
+    ("mul", "[@x]", 2, "[@x]"),
+    ("add", "[@n]", -1, "[@n]"),
+    ("jt", "[@n]", "@loop"),
+    ("out", "[@x]"),
+    ("hlt",),
+    "n:", ("data", [0]), "x:", ("data", [1]),
+])
+
+SHAPES = {
+    "bottom_test": (COUNT, 1, [[1], [2], [3], [10]]),
+    "top_compare_and_branch": (TOP_COMPARE, 1, [[37, 0], [37, 1], [37, 2], [-4, 50]]),
+    "top_jump": (TOP_JUMP, 1, [[0], [1], [2], [40]]),
+    "middle_exit": (MIDDLE_EXIT, 1, [[0], [1], [2], [40]]),
+    "bottom_equals": (BOTTOM_EQUALS, 1, [[3], [6], [9], [300]]),
+    "doubling": (DOUBLING, 0, [[1], [2], [40]]),
+}
+
+
+def test_summary_is_dropped_when_copied_loop_code_changes():
+    program = Program(COUNT, [10])
+    assert summarize_loops(program) == 1
+    changed = COUNT[:]
+    changed[STEP] = -2
+    expected = list(Program(changed, [10]))
+
+    clone = program.fork()
+    clone[STEP] = -2
+    assert list(clone) == expected
+
+    restored = Program(COUNT)
+    restored.restore(program.snapshot())
+    restored[STEP] = -2
+    assert list(restored) == expected
+
+    waiting = Program(COUNT)
+    summarize_loops(waiting)
+    specialized, _ = Specializer(waiting).specialize()
+    specialized[STEP] = -2
+    specialized.send_input(10)
+    assert list(specialized) == expected
+    assert list(program) == [55]
+
+
+def test_summary_survives_starting_from_an_image():
+    program = Program(ProgramImage(COUNT), [1000])
+    summarize_loops(program)
+    assert list(program.fork()) == [500500]
+
+
+@pytest.mark.parametrize("name", SHAPES)
+def test_loop_shapes_are_summarized_and_match_the_interpreter(name):
+    code, loop_count, input_lists = SHAPES[name]
+    assert len(find_loops(Program(code))) == loop_count
+    for program_class in (Program, JitProgram):
+        for fuse in (False, True):
+            for input_data in input_lists:
+                program = program_class(code, input_data)
+                if fuse:
+                    program.fuse_superinstructions()
+                assert summarize_loops(program) == loop_count
+                assert list(program) == list(Program(code, input_data)), (program_class, fuse, input_data)
+
+
+@pytest.mark.parametrize("code, input_data", [
+    (COUNT, [10 ** 6]),
+    (TOP_COMPARE, [3, 10 ** 6]),
+    (TOP_JUMP, [10 ** 6]),
+    (MIDDLE_EXIT, [10 ** 6]),
+    (BOTTOM_EQUALS, [3 * 10 ** 6]),
+])
+def test_summarized_loops_skip_their_iterations(code, input_data):
+    program = Program(code, input_data)
+    summarize_loops(program)
+    assert program.run_for(100)[0] is RunStatus.HALTED
@@ -0,0 +1,71 @@
+from io import BytesIO
+
+from intcode_computer import Program
+from intcode_native import find_subroutines, install_native_routines, make_native_call, zero_terminated_printer
+from intcode_programs import FIBONACCI, fibonacci
+from intcode_trace import Replay, enable_tracing
+
+GREETING = [ord(c) for c in "Fib?\n"]
+LOAD_ADDRESS = FIBONACCI.index(21001) + 1
+PRINTER = find_subroutines(Program(FIBONACCI))[1]
+print_pointer = zero_terminated_printer(-3, -2)
+
+
+def print_greeting(program, frame):
+    outputs = print_pointer(program, frame)
+    # The Intcode printer leaves its load patched to read the terminator
+    program[LOAD_ADDRESS] = program[frame - 3]
+    return outputs
+
+
+ROUTINES = {PRINTER.fingerprint: print_greeting}
+
+
+def native_program(input_data=None):
+    program = Program(FIBONACCI, input_data)
+    assert install_native_routines(program, ROUTINES) == 1
+    return program
+
+
+def memory(program, size):
+    return [program[address] for address in range(size)]
+
+
+def test_native_printer_matches_interpreter():
+    interpreted = Program(FIBONACCI, [10])
+    native = native_program([10])
+    assert list(native) == list(interpreted) == GREETING + [fibonacci(10)]
+    size = max(len(interpreted.memory), len(native.memory))
+    assert memory(native, size) == memory(interpreted, size)
+
+
+def test_native_call_survives_the_routine_patching_itself():
+    program = native_program([3])
+    native_call = program.decode_cache[PRINTER.entry]
+    assert list(program) == GREETING + [fibonacci(3)]
+    assert program.decode_cache[PRINTER.entry] is native_call
+
+
+def test_snapshot_mid_emission_does_not_reemit():
+    program = native_program([7])
+    assert [next(program), next(program)] == GREETING[:2]
+    state = program.snapshot()
+    clone = program.fork()
+    restored = Program(FIBONACCI)
+    restored.restore(state)
+    expected = GREETING[2:] + [fibonacci(7)]
+    assert list(clone) == list(restored) == list(program) == expected
+
+
+def test_trace_checkpoint_mid_emission_resumes():
+    program = native_program([8])
+    stream = BytesIO()
+    trace = enable_tracing(program, stream, 1)
+    assert list(program) == GREETING + [fibonacci(8)]
+    trace.stop()
+    replay = Replay(stream.getvalue())
+    index = next(i for i, checkpoint in enumerate(replay.checkpoints) if checkpoint.state.pending_outputs)
+    resumed = replay.resume(Program(FIBONACCI), index)
+    # The printer has patched itself by now, so it no longer matches its fingerprint
+    resumed.cache_instruction(PRINTER.entry, make_native_call(PRINTER, print_greeting))
+    assert list(resumed) == replay.outputs_after(index)
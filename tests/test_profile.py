@@ -0,0 +1,81 @@
+import json
+import time
+from collections import Counter
+
+from intcode_computer import Program, RunStatus, collapse_stacks
+from intcode_programs import COMPARE_TO_8, FIBONACCI, asm, fibonacci
+
+GREETING = [ord(c) for c in "Fib?\n"]
+BLOCKED_SECONDS = 0.02
+
+# main calls outer, outer calls inner, and inner closes both frames and returns straight to main
+LONG_JUMP = asm([("arb", "@stack"), ("add", "@back", 0, "{0}"), ("jt", 1, "@outer"),
+                 "back:", ("out", 1), ("hlt",),
+                 "outer:", ("arb", 4), ("add", "@outer_back", 0, "{0}"), ("jt", 1, "@inner"),
+                 "outer_back:", ("hlt",),
+                 "inner:", ("arb", 4), ("out", 2), ("arb", -8), ("jf", 0, "{0}"),
+                 "stack:", ("data", [0] * 16)])
+OUTER, INNER = 12, 22
+
+
+def profiled(image, inputs=()):
+    program = Program(image, list(inputs))
+    profile = program.enable_profiling(call_stacks=True)
+    return program, profile
+
+
+def test_fibonacci_call_stacks_collapse():
+    program, profile = profiled(FIBONACCI, [4])
+    assert list(program)[-1] == fibonacci(4)
+    assert profile.collapsed_stacks() == [
+        "main 9",
+        "main;fn_25 13",
+        "main;fn_25;fn_25 26",
+        "main;fn_25;fn_25;fn_25 28",
+        "main;fn_25;fn_25;fn_25;fn_25 10",
+        "main;fn_69 36",
+    ]
+    assert profile.call_stack == []
+    assert sum(profile.stack_counts.values()) == profile.instructions
+    assert profile.function_counts() == Counter({0: 9, 25: 77, 69: 36})
+    assert profile.collapsed_stacks({25: "fib", 69: "print"})[-2:] == ["main;fib;fib;fib;fib 10", "main;print 36"]
+
+
+def test_return_past_a_frame_unwinds_it():
+    program, profile = profiled(LONG_JUMP)
+    assert list(program) == [2, 1]
+    assert profile.collapsed_stacks() == [
+        "main 5",
+        f"main;fn_{OUTER} 3",
+        f"main;fn_{OUTER};fn_{INNER} 4",
+    ]
+    assert profile.call_stack == []
+
+
+def test_collapse_names_entries():
+    counts = Counter({(0,): 3, (0, 7): 2, (0, 7, 9): 1})
+    assert collapse_stacks(counts) == ["main 3", "main;fn_7 2", "main;fn_7;fn_9 1"]
+    assert collapse_stacks(counts, {0: "start", 9: "leaf"}) == ["start 3", "start;fn_7 2", "start;fn_7;leaf 1"]
+
+
+def test_profile_report_counts_opcodes_addresses_and_blocked_time():
+    for image, inputs, expected in [(COMPARE_TO_8, [8], [1000]), (FIBONACCI, [3], GREETING + [2])]:
+        program = Program(image)
+        profile = program.enable_profiling()
+        status, outputs = program.run_until_blocked()
+        assert status is RunStatus.NEEDS_INPUT
+        time.sleep(BLOCKED_SECONDS)
+        program.send_inputs(inputs)
+        assert outputs + list(program) == expected
+        report = json.loads(profile.to_json())
+        assert report == profile.to_dict()
+        assert report["blocked_time"] >= BLOCKED_SECONDS
+        assert report["instructions"] == sum(report["opcodes"].values()) == sum(report["addresses"].values())
+
+    program = Program(COMPARE_TO_8, [8])
+    profile = program.enable_profiling()
+    assert list(program) == [1000]
+    report = profile.to_dict()
+    assert report["opcodes"] == {"JUMP_IF_TRUE": 2, "INPUT": 1, "EQUALS": 1, "MUL": 1, "OUTPUT": 1, "END": 1}
+    assert report["addresses"] == {str(address): 1 for address in [0, 2, 6, 22, 26, 28, 46]}
+    assert report["blocked_time"] == 0.0
@@ -0,0 +1,98 @@
+from io import BytesIO
+
+from intcode_computer import OpCode, Program, RunStatus
+from intcode_programs import COMPARE_TO_8, FIBONACCI, OPERAND_PATCHING, PATCHED_TABLE_SIZE, QUINE, asm, fibonacci
+from intcode_trace import Replay, enable_tracing
+
+
+def test_run_until_input_stops_on_input_even_when_input_is_queued():
+    program = Program(COMPARE_TO_8, [8])
+    assert list(program.run_until_input()) == []
+    assert program.peek() % 100 == OpCode.INPUT.value
+    assert list(program.input) == [8]
+    program.next_command()
+    assert list(program.run_until_input()) == [1000]
+    assert program.ended
+
+
+def test_run_until_input_yields_outputs_until_halt():
+    assert list(Program(QUINE).run_until_input()) == QUINE
+
+
+def test_run_until_blocked_consumes_queued_input():
+    program = Program(COMPARE_TO_8, [3])
+    assert program.run_until_blocked() == (RunStatus.HALTED, [999])
+
+
+def test_run_until_loop_turns_off_only_the_hashing_it_turned_on():
+    spinning = asm(["spin:", ("jt", 1, "@spin")])
+    program = Program(spinning)
+    assert program.run_until_loop(100) == (RunStatus.LOOPING, [])
+    assert program.hashed_memory is None
+    program.enable_state_hashing()
+    assert program.run_until_loop(100) == (RunStatus.LOOPING, [])
+    assert program.hashed_memory is not None
+    waiting = Program(COMPARE_TO_8)
+    assert waiting.run_until_loop(100) == (RunStatus.NEEDS_INPUT, [])
+    assert waiting.hashed_memory is None
+
+
+def test_writes_to_decoded_cells_drop_the_cached_instruction():
+    program = Program(OPERAND_PATCHING)
+    table = program[2]
+    assert program.run_for(1) == (RunStatus.PREEMPTED, [])
+    assert program.decode_cache[0].params[1] == (0, table)
+    assert program.code_cells[2] == [0]
+    # The program patches the operand itself
+    program.run_for(1)
+    assert 0 not in program.decode_cache and 2 not in program.code_cells
+    assert program.run_for(4) == (RunStatus.PREEMPTED, [0])
+    assert program.decode_cache[0].params[1] == (0, table + 1)
+    # And so does a write from outside
+    program[0] = 1002
+    assert 0 not in program.decode_cache
+    program[0] = 1
+    sums = [sum(i * i for i in range(n + 1)) for n in range(PATCHED_TABLE_SIZE)]
+    assert list(program) == sums[1:]
+    assert program[2] == table + PATCHED_TABLE_SIZE
+
+
+def test_fusing_caches_only_the_fused_pairs():
+    # The stack past the code is full of cells that decode as adds
+    program = Program(FIBONACCI + [1] * 1000, [10])
+    fused = program.fuse_superinstructions()
+    assert fused > 0 and len(program.decode_cache) == fused
+    assert all(instruction.parts for instruction in program.decode_cache.values())
+    assert set(program.code_cells) == {cell for address, instruction in program.decode_cache.items()
+                                       for cell in range(address, address + instruction.size)}
+    assert max(program.code_cells) < len(FIBONACCI)
+    assert list(program)[-1] == fibonacci(10)
+
+
+def test_far_writes_stay_sparse_through_fork_restore_hashing_and_traces():
+    far = 10 ** 8
+    program = Program([1101, 7, 0, far, 4, far, 99])
+    stream = BytesIO()
+    trace = enable_tracing(program, stream, 1)
+    assert list(program) == [7]
+    trace.stop()
+    assert len(program.memory.pages) == 1
+    assert program[far] == 7
+
+    clone = program.fork()
+    clone[far] = 8
+    assert (program[far], clone[far]) == (7, 8)
+    state = clone.snapshot()
+    clone[far + 1] = 9
+    clone.restore(state)
+    assert (clone[far], clone[far + 1]) == (8, 0)
+
+    program.enable_state_hashing()
+    clone.enable_state_hashing()
+    assert program.state_hash() != clone.state_hash()
+    clone[far] = 7
+    assert program.state_hash() == clone.state_hash()
+
+    resumed = Replay(stream.getvalue()).resume(Program([]))
+    assert resumed[far] == 7
+    assert len(resumed.memory.pages) == 1
@@ -0,0 +1,92 @@
+from collections import defaultdict
+
+from intcode_computer import Program
+from intcode_programs import COMPARE_TO_8, asm
+from intcode_scheduler import Scheduler
+
+
+def nic(idle_lines=()):
+    # Reads its address, then echoes every (x, y) packet back as (address, x, y). A poll answered
+    # with -1 runs idle_lines before polling again.
+    return asm([("in", "[@address]"),
+                "poll:", ("in", "[@x]"), ("eq", "[@x]", -1, "[@flag]"), ("jt", "[@flag]", "@idle"),
+                ("in", "[@y]"), ("out", "[@address]"), ("out", "[@x]"), ("out", "[@y]"), ("jt", 1, "@poll"),
+                "idle:", *idle_lines, ("jt", 1, "@poll"),
+                "address:", ("data", [0]), "x:", ("data", [0]), "y:", ("data", [0]),
+                "flag:", ("data", [0]), "counter:", ("data", [0]), "timer:", ("data", [3])])
+
+
+# Counts its polls, so it never comes back to the state it was polled in
+COUNTING_NIC = nic([("add", "[@counter]", 1, "[@counter]")])
+# Sends (address, 99, 99) after its third idle poll, then settles
+DELAYED_NIC = nic([("jf", "[@timer]", "@poll"), ("add", "[@timer]", -1, "[@timer]"), ("jt", "[@timer]", "@poll"),
+                   ("out", "[@address]"), ("out", 99), ("out", 99)])
+COUNTER, TIMER = len(COUNTING_NIC) - 2, len(DELAYED_NIC) - 1
+
+
+def collecting_scheduler(**kwargs):
+    outputs = defaultdict(list)
+    scheduler = Scheduler(lambda node, values: outputs[node].extend(values), quantum=7, **kwargs)
+    return scheduler, outputs
+
+
+def test_nodes_are_tracked_as_runnable_blocked_or_halted():
+    scheduler, outputs = collecting_scheduler()
+    echo = scheduler.add(Program(nic(), [0]))
+    compare = scheduler.add(Program(COMPARE_TO_8, [8]))
+    assert list(scheduler.runnable) == [echo, compare]
+    scheduler.run_until_idle()
+    assert scheduler.blocked == {echo}
+    assert scheduler.halted == {compare}
+    assert not scheduler.runnable and not scheduler.queued
+    assert outputs == {compare: [1000]}
+
+    scheduler.send(compare, [1])
+    assert not scheduler.runnable
+    scheduler.send(echo, [5, 6])
+    assert list(scheduler.runnable) == [echo] and not scheduler.blocked
+    scheduler.run_until_idle()
+    assert outputs[echo] == [0, 5, 6]
+    assert scheduler.blocked == {echo}
+
+
+def test_idle_node_is_blocked_once_a_poll_changes_nothing():
+    scheduler, outputs = collecting_scheduler(idle_input=-1)
+    node = scheduler.add(Program(nic(), [4]))
+    scheduler.run_until_idle()
+    assert scheduler.blocked == {node}
+    assert not outputs
+    # The first -1 is stored over x = 0, the second leaves the node exactly as it was polled
+    assert scheduler.idle_states[node][1] == 2
+    assert not scheduler.programs[node].input
+
+
+def test_idle_polls_are_cut_off():
+    scheduler, _ = collecting_scheduler(idle_input=-1, max_idle_polls=5)
+    node = scheduler.add(Program(COUNTING_NIC, [0]))
+    scheduler.run_until_idle()
+    assert scheduler.blocked == {node}
+    assert scheduler.programs[node][COUNTER] == 5
+
+
+def test_node_that_settles_after_a_poll_still_sends():
+    scheduler, outputs = collecting_scheduler(idle_input=-1)
+    node = scheduler.add(Program(DELAYED_NIC, [2]))
+    scheduler.run_until_idle()
+    assert outputs == {node: [2, 99, 99]}
+    assert scheduler.blocked == {node}
+    assert scheduler.programs[node][TIMER] == 0
+
+
+def test_send_wakes_an_idle_node():
+    scheduler, outputs = collecting_scheduler(idle_input=-1, max_idle_polls=3)
+    node = scheduler.add(Program(COUNTING_NIC, [1]))
+    scheduler.run_until_idle()
+    assert scheduler.blocked == {node}
+    scheduler.send(node, [7, 8])
+    assert node not in scheduler.idle_states
+    assert list(scheduler.runnable) == [node]
+    scheduler.run_until_idle()
+    assert outputs == {node: [1, 7, 8]}
+    # The poll budget starts over after the packet
+    assert scheduler.programs[node][COUNTER] == 6
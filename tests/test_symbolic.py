@@ -0,0 +1,48 @@
+from intcode_computer import Program
+from intcode_programs import NOUN_VERB, asm
+from intcode_symbolic import SymbolicProgram, solve
+
+# Prints noun * 2 when noun < 5 and noun * 3 otherwise
+BRANCHY = asm([
+    ("lt", "[@noun]", 5, "[@small]"),
+    ("jf", "[@small]", "@large"),
+    ("mul", "[@noun]", 2, "[@result]"),
+    ("jt", 1, "@print"),
+    "large:",
+    ("mul", "[@noun]", 3, "[@result]"),
+    "print:",
+    ("out", "[@result]"),
+    ("hlt",),
+    "noun:", ("data", [0]),
+    "small:", ("data", [0]),
+    "result:", ("data", [0]),
+])
+NOUN = BRANCHY.index(99) + 1
+
+
+def concrete_output(noun):
+    program = BRANCHY[:]
+    program[NOUN] = noun
+    return list(Program(program))
+
+
+def test_solutions_off_the_followed_path_are_rejected():
+    symbolic = SymbolicProgram(BRANCHY, {NOUN: "noun"}, assignment={"noun": 1})
+    [output] = symbolic.run()
+    assert str(output) == "2*noun"
+    domains = {"noun": range(100)}
+    assert list(solve(output, 30, domains, symbolic.conditions)) == []
+    assert list(solve(output, 8, domains, symbolic.conditions)) == [{"noun": 4}]
+    assert concrete_output(4) == [8]
+    assert concrete_output(15) == [45]
+
+
+def test_linear_program_solves_without_conditions():
+    symbolic = SymbolicProgram(NOUN_VERB, {1: "noun", 2: "verb"})
+    symbolic.run()
+    [solution] = solve(symbolic.value(0), 19690720, {"noun": range(100), "verb": range(100)}, symbolic.conditions)
+    program = NOUN_VERB[:]
+    program[1], program[2] = solution["noun"], solution["verb"]
+    computer = Program(program)
+    computer.run_to_end()
+    assert computer[0] == 19690720
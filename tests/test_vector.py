@@ -0,0 +1,47 @@
+import itertools
+
+from intcode_computer import Program
+from intcode_programs import COMPARE_TO_8, FIBONACCI, LARGE_PRODUCT, NOUN_VERB, QUINE
+from intcode_vector import VectorProgram, run_lanes
+
+
+def scalar_outputs(program, input_lists):
+    return [list(Program(program, list(inputs))) for inputs in input_lists]
+
+
+def test_lanes_match_program_on_diverging_input():
+    input_lists = [[value] for value in range(-3, 14)]
+    assert run_lanes(COMPARE_TO_8, input_lists) == scalar_outputs(COMPARE_TO_8, input_lists)
+
+
+def test_lanes_match_program_with_relative_mode_and_recursion():
+    input_lists = [[n] for n in range(12)]
+    assert run_lanes(FIBONACCI, input_lists) == scalar_outputs(FIBONACCI, input_lists)
+
+
+def test_lanes_without_input():
+    assert run_lanes(QUINE, [[], []]) == [QUINE, QUINE]
+    assert run_lanes(LARGE_PRODUCT, [[]]) == [[34915192 * 34915192]]
+
+
+def test_lanes_that_overflow_int64_split_off_to_program():
+    program = [3, 13, 1002, 13, 10 ** 10, 13, 1002, 13, 10 ** 10, 13, 4, 13, 99, 0]
+    input_lists = [[0], [1], [7]]
+    assert run_lanes(program, input_lists) == scalar_outputs(program, input_lists)
+
+
+def test_patched_cells_match_program():
+    pairs = list(itertools.product(range(10), range(10)))
+    vector = VectorProgram(NOUN_VERB, len(pairs))
+    vector.set_cell(1, [noun for noun, verb in pairs])
+    vector.set_cell(2, [verb for noun, verb in pairs])
+    vector.run()
+
+    expected = []
+    for noun, verb in pairs:
+        program = Program(NOUN_VERB)
+        program[1] = noun
+        program[2] = verb
+        program.run_to_end()
+        expected.append(program[0])
+    assert vector.cell(0) == expected
@@ -0,0 +1,70 @@
+from intcode_computer import Program, ProgramImage
+from intcode_programs import FIBONACCI, asm, fibonacci
+from intcode_warm_start import WARM_START_MAGIC, load_warm_start, warm_start
+
+FAR = 1 << 40
+# Greets, writes a cell far past the dense pages and one near the code, then adds its input to
+# the far cell
+FAR_WRITER = asm([("out", 72), ("add", 7, 0, f"[{FAR}]"), ("add", 1, 0, "[@cell]"), ("in", "[@n]"),
+                  ("add", "[@n]", f"[{FAR}]", "[@n]"), ("out", "[@n]"), ("hlt",),
+                  "n:", ("data", [0]), "cell:", ("data", [0])])
+
+
+class BootCountingProgram(Program):
+    boots = 0
+
+    def run_until_blocked(self):
+        BootCountingProgram.boots += 1
+        return super().run_until_blocked()
+
+
+def boot(image, path):
+    BootCountingProgram.boots = 0
+    program, outputs = warm_start(image, path, program_class=BootCountingProgram)
+    return program, outputs, BootCountingProgram.boots
+
+
+def test_saved_state_round_trips(tmp_path):
+    path = str(tmp_path / "far.warm")
+    image = ProgramImage(FAR_WRITER)
+    cold, cold_outputs, boots = boot(image, path)
+    assert (cold_outputs, boots) == ([72], 1)
+    warm, warm_outputs, boots = boot(image, path)
+    assert (warm_outputs, boots) == ([72], 0)
+    # The decode cache is not saved, it refills as the program runs
+    assert warm.snapshot()._replace(decoded=()) == cold.snapshot()._replace(decoded=())
+    assert warm[FAR] == 7 and warm[len(FAR_WRITER) - 1] == 1
+    warm.send_input(5)
+    assert list(warm) == [12]
+
+
+def test_fingerprint_change_invalidates_the_saved_state(tmp_path):
+    path = str(tmp_path / "shared.warm")
+    boot(ProgramImage(FAR_WRITER), path)
+    fib = ProgramImage(FIBONACCI)
+    assert load_warm_start(path, fib) is None
+    program, outputs, boots = boot(fib, path)
+    assert (outputs, boots) == ([ord(c) for c in "Fib?\n"], 1)
+    # The cold start replaces the other image's state
+    assert load_warm_start(path, fib) is not None
+    assert load_warm_start(path, ProgramImage(FAR_WRITER)) is None
+    program.send_input(6)
+    assert list(program) == [fibonacci(6)]
+
+
+def test_truncated_or_foreign_files_fall_back_to_a_cold_start(tmp_path):
+    path = tmp_path / "far.warm"
+    image = ProgramImage(FAR_WRITER)
+    assert load_warm_start(str(path), image) is None
+    boot(image, str(path))
+    saved = path.read_bytes()
+    for length in range(len(saved)):
+        path.write_bytes(saved[:length])
+        assert load_warm_start(str(path), image) is None
+    for foreign in [b"", b"\x00" * 64, WARM_START_MAGIC[:-1] + b"\x01" + saved[len(WARM_START_MAGIC):]]:
+        path.write_bytes(foreign)
+        program, outputs, boots = boot(image, str(path))
+        assert (outputs, boots) == ([72], 1)
+        program.send_input(1)
+        assert list(program) == [8]
+    assert path.read_bytes() == saved
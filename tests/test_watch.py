@@ -0,0 +1,58 @@
+from io import BytesIO
+
+from intcode_computer import Program, RunStatus
+from intcode_jit import JitProgram
+from intcode_programs import asm
+from intcode_trace import Replay, enable_tracing
+
+# Counts down from its input, storing each value before printing it
+COUNTDOWN = asm([
+    ("in", "[@counter]"),
+    "loop:",
+    ("out", "[@counter]"),
+    ("add", "[@counter]", -1, "[@counter]"),
+    ("jt", "[@counter]", "@loop"),
+    ("hlt",),
+    "counter:", ("data", [0]),
+])
+COUNTER = len(COUNTDOWN) - 1
+
+
+def test_watch_stops_on_write_with_other_hooks_installed_later():
+    program = Program(COUNTDOWN, [3])
+    program.watch(COUNTER, callback=lambda program, address, value: value == 1)
+    stream = BytesIO()
+    trace = enable_tracing(program, stream)
+    program.enable_profiling()
+    assert program.run_until_blocked() == (RunStatus.WATCHPOINT, [3, 2])
+    assert program[COUNTER] == 1
+    assert program.run_until_blocked() == (RunStatus.HALTED, [1])
+    trace.stop()
+    assert Replay(stream.getvalue()).outputs == [3, 2, 1]
+
+
+def test_read_watchpoint_reports_the_output_of_the_hit_step():
+    program = Program(COUNTDOWN, [2])
+    program.enable_profiling()
+    program.watch(COUNTER, reads=True, writes=False)
+    assert program.run_until_blocked() == (RunStatus.WATCHPOINT, [2])
+
+
+def test_watchpoints_survive_restore():
+    program = Program(COUNTDOWN, [2])
+    start = program.snapshot()
+    program.watch(COUNTER)
+    assert program.run_until_blocked()[0] is RunStatus.WATCHPOINT
+    program.restore(start)
+    assert program.run_until_blocked() == (RunStatus.WATCHPOINT, [])
+    assert program[COUNTER] == 2
+
+
+def test_unwatch_returns_to_the_jit():
+    program = JitProgram(COUNTDOWN, [2])
+    watchpoint = program.watch(COUNTER)
+    assert "next_command" in program.__dict__
+    assert program.run_until_blocked()[0] is RunStatus.WATCHPOINT
+    program.unwatch(watchpoint)
+    assert "next_command" not in program.__dict__
+    assert program.run_until_blocked() == (RunStatus.HALTED, [2, 1])